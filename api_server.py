@@ -0,0 +1,411 @@
+import os
+import json
+import asyncio
+import threading
+from functools import partial
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+
+import groq_client
+from budgets import get_budget_tracker
+from post_validator import generate_validated_post, repair_post, is_error_response
+from near_duplicates import NearDuplicateIndex
+from state_backend import ScheduleStore, JobQueue, allow_request, shared_lock
+from structured_output import LOCALES, generate_localized_posts, stream_localized_posts, compose_post
+from compliance import PhraseMatcher, load_compliance_phrases, missing_disclosures
+from carousel import select_carousel, listing_key, MAX_CAROUSEL_SIZE
+from overlays import load_overlay_templates, render_batch, DEFAULT_LOGO_PATH
+from image_catalog import load_image_catalog
+from posting_times import get_engagement_curves, suggest_slot, to_local
+from warmup import start_warmup
+
+# Standalone HTTP API for CRM integration. Run it with several workers:
+#   uvicorn api_server:app --host 0.0.0.0 --port 8000 --workers 4
+# The Groq key is read from GROQ_API_KEY or .streamlit/secrets.toml. Set ALIRA_REDIS_URL so
+# workers and replicas share the response cache, schedule, job queue and rate limits.
+
+PLATFORMS = ["Facebook", "Instagram", "LinkedIn"]
+IMAGES_FOLDER = os.environ.get("ALIRA_IMAGES_FOLDER", "images")
+SCHEDULE_OWNER = "api"
+# Requests per client (X-Agent-Id header, or the client address) per minute
+API_RATE_LIMIT = int(os.environ.get("ALIRA_API_RATE_LIMIT", 60))
+JOB_POLL_INTERVAL = 0.5
+MAX_OVERLAY_BATCH = 200
+
+GROQ_API_KEY = groq_client.load_api_key()
+COMPLIANCE_PHRASES, REQUIRED_DISCLOSURES = load_compliance_phrases()
+COMPLIANCE_MATCHER = PhraseMatcher(COMPLIANCE_PHRASES)
+
+# Shared schedule and job queue; each worker keeps its own near-duplicate index and list of
+# publish times in sync with the schedule, reading only the posts added since the last sync
+schedule_store = ScheduleStore()
+generation_jobs = JobQueue("generate")
+duplicate_index = NearDuplicateIndex()
+scheduled_times = []
+_indexed_posts = 0
+_sync_lock = threading.Lock()
+_schedule_lock = asyncio.Lock()
+
+
+# Function to process queued generation jobs in the background of every worker
+async def run_job_worker():
+    while True:
+        job = await run_in_threadpool(generation_jobs.dequeue)
+        if job is None:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            continue
+        payload = job["payload"]
+        try:
+            results = await asyncio.gather(*[
+                run_in_threadpool(generate_post, payload["prompt"], platform, payload.get("agent")) for platform in payload["platforms"]
+            ])
+            generation_jobs.set_status(job["id"], "done", {result["platform"]: result for result in results})
+        except Exception as e:
+            generation_jobs.set_status(job["id"], "failed", {"error": str(e)})
+
+
+# Warm caches and the Groq connection and start the job worker when each worker process starts
+@asynccontextmanager
+async def lifespan(app):
+    start_warmup(GROQ_API_KEY, IMAGES_FOLDER)
+    worker = asyncio.create_task(run_job_worker())
+    yield
+    worker.cancel()
+
+
+app = FastAPI(title="Alira Content API", lifespan=lifespan)
+
+
+class GenerateRequest(BaseModel):
+    prompt: str = Field(..., min_length=1)
+    platform: str = "Facebook"
+    stream: bool = False
+
+
+class GenerateAllRequest(BaseModel):
+    prompt: str = Field(..., min_length=1)
+    platforms: list[str] = PLATFORMS
+    stream: bool = False
+
+
+class LocalizedRequest(BaseModel):
+    prompt: str = Field(..., min_length=1)
+    platform: str = "Facebook"
+    locales: list[str] = ["en"]
+    stream: bool = False
+
+
+class ImageSelectRequest(BaseModel):
+    count: int = Field(1, ge=1, le=MAX_CAROUSEL_SIZE)
+    # Listing id (or its description) so recently used photos are not repeated
+    listing: str | None = None
+
+
+class OverlayRequest(BaseModel):
+    images: list[str] = Field(..., min_length=1, max_length=MAX_OVERLAY_BATCH)
+    platforms: list[str] = ["Facebook"]
+    template: str = "just_listed"
+    price: str | None = None
+    address: str | None = None
+    agent: str | None = None
+
+
+class ScheduleRequest(BaseModel):
+    content: str = Field(..., min_length=1)
+    platform: str = "Facebook"
+    title: str | None = None
+    force: bool = False
+    # Publish time; the best open slot for the platform when left out
+    scheduled_for: datetime | None = None
+
+
+# Function to apply the per-client rate limit and token budgets; returns the agent the request is counted for
+def _check_rate_limit(request):
+    client = request.headers.get("X-Agent-Id") or (request.client.host if request.client else "unknown")
+    if not allow_request(f"api:{client}", API_RATE_LIMIT, 60):
+        raise HTTPException(status_code=429, detail=f"Rate limit of {API_RATE_LIMIT} requests per minute exceeded")
+    status = get_budget_tracker().status(client)
+    if not status.allowed:
+        raise HTTPException(status_code=429, detail=f"Budget exceeded: {'; '.join(status.exceeded)}")
+    return client
+
+
+def _check_platform(platform):
+    if platform not in PLATFORMS:
+        raise HTTPException(status_code=422, detail=f"Unknown platform '{platform}'. Use one of {PLATFORMS}.")
+
+
+def _generate(prompt, platform, agent=None):
+    return groq_client.generate_content_groq(prompt, platform, GROQ_API_KEY, agent=agent)
+
+
+def _compliance_report(content):
+    matches = COMPLIANCE_MATCHER.scan(content)
+    return {
+        "violations": [match._asdict() for match in matches],
+        "missing_disclosures": missing_disclosures(content, REQUIRED_DISCLOSURES),
+    }
+
+
+# Function to run the same generate -> repair -> compliance pipeline as the apps
+def generate_post(prompt, platform, agent=None):
+    content, validation_issues = generate_validated_post(partial(_generate, agent=agent), prompt, platform)
+    if is_error_response(content):
+        return {"platform": platform, "error": content}
+    return {
+        "platform": platform,
+        "content": content,
+        "validation_issues": validation_issues,
+        "compliance": _compliance_report(content),
+    }
+
+
+def _ndjson(record):
+    return json.dumps(record) + "\n"
+
+
+# Function to stream one platform's post as NDJSON: chunks with compliance flags, then the repaired post
+async def _stream_post(prompt, platform, agent=None):
+    scanner = COMPLIANCE_MATCHER.scanner()
+    parts = []
+    async for chunk in iterate_in_threadpool(groq_client.stream_content_groq(prompt, platform, GROQ_API_KEY, agent)):
+        parts.append(chunk)
+        flags = [match._asdict() for match in scanner.feed(chunk)]
+        yield _ndjson({"type": "chunk", "platform": platform, "text": chunk, "flags": flags})
+
+    content = "".join(parts)
+    if is_error_response(content):
+        yield _ndjson({"type": "error", "platform": platform, "error": content})
+        return
+
+    scanner.finish()
+    repaired, validation_issues = repair_post(content, platform, prompt)
+    yield _ndjson({
+        "type": "done",
+        "platform": platform,
+        "content": repaired,
+        "validation_issues": validation_issues,
+        "compliance": _compliance_report(repaired),
+    })
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "time": datetime.now().isoformat(timespec="seconds")}
+
+
+@app.post("/generate")
+async def generate(request: GenerateRequest, http_request: Request):
+    agent = _check_rate_limit(http_request)
+    _check_platform(request.platform)
+    if request.stream:
+        return StreamingResponse(_stream_post(request.prompt, request.platform, agent), media_type="application/x-ndjson")
+
+    result = await run_in_threadpool(generate_post, request.prompt, request.platform, agent)
+    if "error" in result:
+        raise HTTPException(status_code=502, detail=result["error"])
+    return result
+
+
+@app.post("/generate/all")
+async def generate_all(request: GenerateAllRequest, http_request: Request):
+    agent = _check_rate_limit(http_request)
+    for platform in request.platforms:
+        _check_platform(platform)
+
+    tasks = [asyncio.ensure_future(run_in_threadpool(generate_post, request.prompt, platform, agent)) for platform in request.platforms]
+
+    if request.stream:
+        # Emit each platform's post as soon as it is ready
+        async def stream_results():
+            for task in asyncio.as_completed(tasks):
+                yield _ndjson(await task)
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    return {"results": {result["platform"]: result for result in results}}
+
+
+# Function to turn validated locale fields into the API response shape
+def _localized_result(platform, posts, errors):
+    result = {"platform": platform, "locales": {}, "schema_errors": errors}
+    for locale, (content, validation_issues) in posts.items():
+        result["locales"][locale] = {
+            "content": content,
+            "validation_issues": validation_issues,
+            "compliance": _compliance_report(content),
+        }
+    return result
+
+
+# Function to stream partial locale fields as they are parsed, then the composed posts
+async def _stream_localized(prompt, platform, locales, agent=None):
+    try:
+        async for posts, errors, done in iterate_in_threadpool(stream_localized_posts(prompt, platform, locales, GROQ_API_KEY, agent)):
+            if not done:
+                yield _ndjson({"type": "partial", "platform": platform, "locales": posts})
+                continue
+            # Same outcome as the non-streamed request, which answers 502 when no locale validated
+            if not posts:
+                yield _ndjson({"type": "error", "platform": platform, "error": "No locale passed validation", "schema_errors": errors})
+                continue
+            composed = {locale: compose_post(fields, platform, prompt, locale) for locale, fields in posts.items()}
+            yield _ndjson({"type": "done", **_localized_result(platform, composed, errors)})
+    except Exception as e:
+        yield _ndjson({"type": "error", "platform": platform, "error": str(e)})
+
+
+@app.post("/generate/localized")
+async def generate_localized(request: LocalizedRequest, http_request: Request):
+    agent = _check_rate_limit(http_request)
+    _check_platform(request.platform)
+    unknown = [locale for locale in request.locales if locale not in LOCALES]
+    if unknown or not request.locales:
+        raise HTTPException(status_code=422, detail=f"Unsupported locales {unknown}. Use any of {list(LOCALES)}.")
+
+    if request.stream:
+        return StreamingResponse(_stream_localized(request.prompt, request.platform, request.locales, agent),
+                                 media_type="application/x-ndjson")
+
+    posts, errors = await run_in_threadpool(generate_localized_posts, request.prompt, request.platform, request.locales, GROQ_API_KEY, agent)
+    if not posts:
+        raise HTTPException(status_code=502, detail=errors)
+    return _localized_result(request.platform, posts, errors)
+
+
+@app.post("/images/select")
+async def select_images(request: ImageSelectRequest):
+    listing = listing_key(request.listing) if request.listing else None
+    images = await run_in_threadpool(select_carousel, IMAGES_FOLDER, request.count, listing)
+    if not images:
+        raise HTTPException(status_code=404, detail=f"No images found in '{IMAGES_FOLDER}'")
+    return {"images": images}
+
+
+# Bulk overlay rendering; already rendered overlays are returned without rendering again
+@app.post("/images/overlay")
+async def render_overlays(request: OverlayRequest):
+    for platform in request.platforms:
+        _check_platform(platform)
+    if request.template not in load_overlay_templates():
+        raise HTTPException(status_code=422, detail=f"Unknown template '{request.template}'. Use one of {list(load_overlay_templates())}.")
+    catalog = set(load_image_catalog(IMAGES_FOLDER))
+    unknown = [image for image in request.images if image not in catalog]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Images not in '{IMAGES_FOLDER}': {unknown}")
+
+    fields = {"price": request.price, "address": request.address, "agent": request.agent, "logo": DEFAULT_LOGO_PATH}
+    jobs = [
+        {"image_path": image, "platform": platform, "template": request.template, "fields": fields}
+        for image in request.images for platform in request.platforms
+    ]
+    paths = await run_in_threadpool(render_batch, jobs)
+    return {"overlays": [{"image": job["image_path"], "platform": job["platform"], "path": path} for job, path in zip(jobs, paths)]}
+
+
+@app.post("/jobs", status_code=202)
+async def enqueue_job(request: GenerateAllRequest, http_request: Request):
+    agent = _check_rate_limit(http_request)
+    for platform in request.platforms:
+        _check_platform(platform)
+    job_id = await run_in_threadpool(generation_jobs.enqueue, {"prompt": request.prompt, "platforms": request.platforms, "agent": agent})
+    return {"id": job_id, "status": "queued"}
+
+
+# Usage report: requests and tokens per agent and per team against their budgets
+@app.get("/usage")
+async def usage_report():
+    return {"usage": await run_in_threadpool(get_budget_tracker().report)}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    status = await run_in_threadpool(generation_jobs.get_status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return {"id": job_id, **status}
+
+
+# Function to add posts scheduled by any worker/replica to this worker's near-duplicate index and publish times
+def _sync_schedule():
+    global _indexed_posts
+    for post in schedule_store.list(SCHEDULE_OWNER, start=_indexed_posts):
+        duplicate_index.add(post["id"], post["content"], post["platform"])
+        if post.get("scheduled_for"):
+            scheduled_times.append((post["platform"], post["scheduled_for"]))
+        _indexed_posts = post["id"] + 1
+
+
+def _find_duplicates(content, platform):
+    with _sync_lock:
+        _sync_schedule()
+        return duplicate_index.query(content, platform)
+
+
+def _suggest_slot(platform):
+    with _sync_lock:
+        _sync_schedule()
+        occupied = list(scheduled_times)
+    return suggest_slot(platform, get_engagement_curves().curve(platform), occupied)
+
+
+# Best open publish slot for a platform, from the imported engagement history
+@app.get("/schedule/suggest")
+async def suggest_schedule_slot(platform: str = "Facebook"):
+    _check_platform(platform)
+    slot = await run_in_threadpool(_suggest_slot, platform)
+    return {"platform": platform, "scheduled_for": slot.isoformat()}
+
+
+@app.get("/schedule")
+async def list_schedule(platform: str | None = None):
+    posts = await run_in_threadpool(schedule_store.list, SCHEDULE_OWNER, 0, platform)
+    return {"posts": posts}
+
+
+# Function to check for near-duplicates and add the post as one step for all workers and replicas;
+# returns (post, None), or (None, duplicates) when the post was not added
+def _schedule_post(request):
+    with shared_lock("schedule"):
+        duplicates = _find_duplicates(request.content, request.platform)
+        if duplicates and not request.force:
+            return None, duplicates
+
+        # Stored as naive local time (ALIRA_TIMEZONE), like the suggested slots
+        if request.scheduled_for is not None:
+            scheduled_for = to_local(request.scheduled_for).to_pydatetime()
+        else:
+            scheduled_for = _suggest_slot(request.platform)
+        post = schedule_store.add(SCHEDULE_OWNER, {
+            "title": request.title or f"AI Generated Content - {request.platform}",
+            "platform": request.platform,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "scheduled_for": scheduled_for.isoformat(timespec="minutes"),
+            "content": request.content,
+        })
+    return post, None
+
+
+@app.post("/schedule", status_code=201)
+async def schedule(request: ScheduleRequest):
+    _check_platform(request.platform)
+    # The shared lock is held in a worker thread; this one keeps requests of the same worker from queueing there
+    async with _schedule_lock:
+        post, duplicates = await run_in_threadpool(_schedule_post, request)
+    if post is None:
+        raise HTTPException(status_code=409, detail={
+            "message": "Near-duplicate of an already scheduled post; resend with force=true to schedule anyway.",
+            "duplicates": [{"id": key, "similarity": similarity} for key, similarity in duplicates],
+        })
+    return post
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("api_server:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8000)),
+                workers=int(os.environ.get("ALIRA_API_WORKERS", 4)))
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import threading
+from collections import namedtuple
+
+import state_backend
+
+# Per-agent and per-team Groq budgets, counted in the shared state backend so every replica
+# sees the same usage. Override the defaults with a budgets.json file:
+# {"agent": {...}, "team": {...}, "agents": {"Sarah Mitchell": {"team": "Downtown", ...}}, "teams": {"Downtown": {...}}}
+BUDGETS_FILE = "budgets.json"
+DEFAULT_TEAM = "default"
+DEFAULT_BUDGETS = {
+    "agent": {"requests_per_minute": 20, "tokens_per_minute": 20000, "tokens_per_day": 300000},
+    "team": {"requests_per_minute": 100, "tokens_per_minute": 100000, "tokens_per_day": 1500000},
+}
+
+# Budget -> (counted metric, sliding window in seconds)
+BUDGET_WINDOWS = {
+    "requests_per_minute": ("requests", 60),
+    "tokens_per_minute": ("tokens", 60),
+    "tokens_per_day": ("tokens", 24 * 60 * 60),
+}
+# Each window is kept as this many sub-buckets; the oldest one is weighted by its overlap
+WINDOW_BUCKETS = 12
+# Warn once this share of a budget is used
+SOFT_LIMIT_RATIO = 0.8
+
+BudgetStatus = namedtuple("BudgetStatus", ["allowed", "warnings", "exceeded", "usage"])
+
+_budgets = None
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+# Function to load the budget configuration once per process
+def load_budgets(path=BUDGETS_FILE):
+    global _budgets
+    if _budgets is None:
+        budgets = {"agent": dict(DEFAULT_BUDGETS["agent"]), "team": dict(DEFAULT_BUDGETS["team"]), "agents": {}, "teams": {}}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                config = json.load(f)
+            for scope in ("agent", "team"):
+                budgets[scope].update(config.get(scope, {}))
+            budgets["agents"].update(config.get("agents", {}))
+            budgets["teams"].update(config.get("teams", {}))
+        _budgets = budgets
+    return _budgets
+
+
+def describe_budget(budget):
+    return budget.replace("_", " ")
+
+
+# Sliding-window usage counters and budget checks
+class BudgetTracker:
+    def __init__(self, backend=None, budgets=None):
+        self.backend = backend or state_backend.get_state_backend()
+        self.budgets = budgets or load_budgets()
+
+    def team_for(self, agent):
+        return self.budgets["agents"].get(agent, {}).get("team", DEFAULT_TEAM)
+
+    def limits_for(self, scope, name):
+        overrides = self.budgets["agents" if scope == "agent" else "teams"].get(name, {})
+        return {budget: overrides.get(budget, limit) for budget, limit in self.budgets[scope].items() if budget in BUDGET_WINDOWS}
+
+    def _bucket_key(self, scope, name, metric, window, bucket):
+        return state_backend.make_key("usage", scope, name, metric, window, bucket)
+
+    def _add(self, scope, name, metric, amount, now):
+        for budget, (budget_metric, window) in BUDGET_WINDOWS.items():
+            if budget_metric != metric:
+                continue
+            size = window / WINDOW_BUCKETS
+            key = self._bucket_key(scope, name, metric, window, int(now // size))
+            self.backend.incrby(key, amount)
+            self.backend.expire(key, int(window + size) + 1)
+
+    def _window_total(self, scope, name, metric, window, now):
+        size = window / WINDOW_BUCKETS
+        current = int(now // size)
+        keys = [self._bucket_key(scope, name, metric, window, bucket) for bucket in range(current - WINDOW_BUCKETS, current + 1)]
+        values = [int(value or 0) for value in self.backend.mget(keys)]
+        # The oldest bucket only partly overlaps the window
+        overlap = 1 - (now % size) / size
+        return values[0] * overlap + sum(values[1:])
+
+    # Function to read usage per budget for one agent or team: {budget: (used, limit)}
+    def usage(self, scope, name, now=None):
+        now = time.time() if now is None else now
+        limits = self.limits_for(scope, name)
+        return {
+            budget: (round(self._window_total(scope, name, *BUDGET_WINDOWS[budget], now)), limit)
+            for budget, limit in limits.items()
+        }
+
+    # Function to check an agent and their team before a request
+    # (reserved=True when the request has already been counted)
+    def status(self, agent, now=None, reserved=False):
+        warnings = []
+        exceeded = []
+        usage = {}
+        for scope, name in (("agent", agent), ("team", self.team_for(agent))):
+            usage[scope] = self.usage(scope, name, now)
+            for budget, (used, limit) in usage[scope].items():
+                # A request is only allowed if it fits; tokens are only known afterwards,
+                # so a token budget that is already used up blocks the next request
+                if BUDGET_WINDOWS[budget][0] == "requests":
+                    needed, used = (used, used - 1) if reserved else (used + 1, used)
+                    over = needed > limit
+                else:
+                    over = used >= limit
+                label = f"{name} ({scope})" if scope == "team" else name
+                if limit and over:
+                    exceeded.append(f"{label} has used {used:,} of {limit:,} {describe_budget(budget)}")
+                elif limit and used >= limit * SOFT_LIMIT_RATIO:
+                    warnings.append(f"{label} has used {used:,} of {limit:,} {describe_budget(budget)}")
+        return BudgetStatus(not exceeded, warnings, exceeded, usage)
+
+    # Function to count a request against the budgets; raises BudgetExceeded over a hard limit
+    def reserve(self, agent, now=None):
+        now = time.time() if now is None else now
+        team = self.team_for(agent)
+        # Count the request first and check afterwards, so concurrent requests on any replica
+        # can't all pass the same check; a request over a limit is taken back out again
+        self._add("agent", agent, "requests", 1, now)
+        self._add("team", team, "requests", 1, now)
+        status = self.status(agent, now, reserved=True)
+        if not status.allowed:
+            self._add("agent", agent, "requests", -1, now)
+            self._add("team", team, "requests", -1, now)
+            raise BudgetExceeded(f"Budget exceeded: {'; '.join(status.exceeded)}")
+
+        # Remember who used the API, for the usage report (a set, so each agent is stored once)
+        self.backend.sadd(state_backend.make_key("usage", "agent_names"), agent)
+        return status
+
+    # Function to count the tokens reported in a response's usage
+    def record_tokens(self, agent, tokens, now=None):
+        if not tokens:
+            return
+        now = time.time() if now is None else now
+        self._add("agent", agent, "tokens", tokens, now)
+        self._add("team", self.team_for(agent), "tokens", tokens, now)
+
+    # Function to build a usage report: one row per agent and per team
+    def report(self, now=None):
+        agents = self.backend.smembers(state_backend.make_key("usage", "agent_names")) | set(self.budgets["agents"])
+        teams = {self.team_for(agent) for agent in agents} | set(self.budgets["teams"])
+        rows = []
+        for scope, names in (("agent", sorted(agents)), ("team", sorted(teams))):
+            for name in names:
+                row = {"scope": scope, "name": name}
+                for budget, (used, limit) in self.usage(scope, name, now).items():
+                    row[budget] = used
+                    row[f"{budget}_limit"] = limit
+                rows.append(row)
+        return rows
+
+
+# Function to get the budget tracker for this process
+def get_budget_tracker():
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = BudgetTracker()
+    return _tracker
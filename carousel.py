@@ -0,0 +1,171 @@
+import os
+import json
+import random
+import threading
+
+import numpy as np
+from PIL import Image
+
+import state_backend
+from image_catalog import load_image_catalog
+
+# Perceptual hashes are cached on disk so large libraries are only hashed once
+HASH_CACHE_DIR = ".cache"
+MIN_CAROUSEL_SIZE = 3
+MAX_CAROUSEL_SIZE = 10
+# Trade-off between freshness (1.0) and visual diversity (0.0) in the max-marginal-relevance pick
+MMR_LAMBDA = 0.5
+# Images this similar to one already picked are treated as the same photo
+NEAR_DUPLICATE_SIMILARITY = 0.9
+# How many recent picks per listing are kept (and avoided)
+USAGE_HISTORY_SIZE = 30
+USAGE_TTL = 30 * 24 * 60 * 60
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+# Function to compute a 64-bit difference hash (dHash) of an image
+def dhash(image_path):
+    with Image.open(image_path) as image:
+        # Let the JPEG decoder downscale; the hash only needs a 9x8 thumbnail
+        image.draft("L", (64, 64))
+        pixels = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+# Function to count differing bits between one hash and an array of hashes
+def hamming_distances(hashes, value):
+    xor = np.bitwise_xor(hashes, np.uint64(value))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor).astype(np.int16)
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1).astype(np.int16)
+
+
+# Precomputed perceptual hashes for every image in a folder
+class ImageHashIndex:
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.catalog = None
+        self.paths = []
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.positions = {}
+
+    def _cache_path(self):
+        name = state_backend.hash_key(os.path.abspath(self.folder_path))[:16]
+        return os.path.join(HASH_CACHE_DIR, f"image_hashes_{name}.json")
+
+    # Function to (re)build the index, hashing only new or changed files
+    def refresh(self):
+        catalog = load_image_catalog(self.folder_path)
+        cache_path = self._cache_path()
+        cached = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                # An unreadable cache is rebuilt from the images
+                cached = {}
+
+        entries = {}
+        changed = False
+        for image_path in catalog:
+            stat = os.stat(image_path)
+            stamp = f"{stat.st_mtime_ns}:{stat.st_size}"
+            entry = cached.get(image_path)
+            if entry is None or entry[0] != stamp:
+                try:
+                    entry = [stamp, dhash(image_path)]
+                except Exception:
+                    continue
+                changed = True
+            entries[image_path] = entry
+
+        if changed or len(entries) != len(cached):
+            os.makedirs(HASH_CACHE_DIR, exist_ok=True)
+            # Write to a temporary file first so other processes never read a half-written cache
+            temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(temporary_path, cache_path)
+
+        self.catalog = catalog
+        self.paths = list(entries)
+        self.hashes = np.array([entries[path][1] for path in self.paths], dtype=np.uint64)
+        self.positions = {path: position for position, path in enumerate(self.paths)}
+        return self
+
+
+# Function to get the hash index for a folder, refreshed when the folder changes
+def get_hash_index(folder_path):
+    catalog = load_image_catalog(folder_path)
+    with _index_lock:
+        index = _indexes.get(folder_path)
+        # load_image_catalog returns the same list until the folder changes
+        if index is None or index.catalog is not catalog:
+            index = ImageHashIndex(folder_path).refresh()
+            _indexes[folder_path] = index
+        return index
+
+
+def listing_key(description):
+    return state_backend.hash_key(" ".join(description.lower().split()))
+
+
+# Function to read the images recently used for a listing (most recent last)
+def get_recent_images(listing, backend=None):
+    backend = backend or state_backend.get_state_backend()
+    raw = backend.get(state_backend.make_key("carousel", "usage", listing))
+    return json.loads(raw) if raw else []
+
+
+def record_usage(listing, image_paths, backend=None):
+    backend = backend or state_backend.get_state_backend()
+    recent = [path for path in get_recent_images(listing, backend) if path not in image_paths] + list(image_paths)
+    backend.set(
+        state_backend.make_key("carousel", "usage", listing),
+        json.dumps(recent[-USAGE_HISTORY_SIZE:]),
+        ex=USAGE_TTL,
+    )
+
+
+# Function to pick a diverse carousel with max-marginal-relevance over perceptual hashes.
+# Recently used images for the listing score lowest, near-identical photos are never picked twice.
+def select_carousel(folder_path, count, listing=None, mmr_lambda=MMR_LAMBDA, rng=None):
+    index = get_hash_index(folder_path)
+    total = len(index.paths)
+    if total == 0:
+        return []
+    count = min(count, total)
+    rng = rng or np.random.default_rng(random.getrandbits(32))
+
+    # Relevance: fresh images first, with jitter so equal candidates rotate between calls
+    relevance = rng.random(total) * 0.1 + 0.9
+    recent = get_recent_images(listing) if listing else []
+    for age, image_path in enumerate(reversed(recent)):
+        position = index.positions.get(image_path)
+        if position is not None:
+            relevance[position] = 0.5 * age / max(len(recent), 1)
+
+    max_similarity = np.zeros(total)
+    available = np.ones(total, dtype=bool)
+    selected = []
+    for _ in range(count):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            break
+        selected.append(best)
+        available[best] = False
+
+        similarity = 1.0 - hamming_distances(index.hashes, index.hashes[best]) / 64.0
+        np.maximum(max_similarity, similarity, out=max_similarity)
+        available &= similarity < NEAR_DUPLICATE_SIMILARITY
+
+    image_paths = [index.paths[position] for position in selected]
+    if listing:
+        record_usage(listing, image_paths)
+    return image_paths
@@ -0,0 +1,201 @@
+import os
+import gzip
+import json
+import time
+import threading
+
+import state_backend
+
+# Record/replay of Groq chat completions, for offline and deterministic runs.
+# ALIRA_CASSETTE_MODE=record saves every request/response (streamed chunks with their timing),
+# ALIRA_CASSETTE_MODE=replay serves them from the cassette without touching the network.
+CASSETTE_MODE_ENV_VAR = "ALIRA_CASSETTE_MODE"
+CASSETTE_PATH_ENV_VAR = "ALIRA_CASSETTE"
+# 1 replays at the recorded speed, 10 ten times faster, 0 without any delay
+REPLAY_SPEED_ENV_VAR = "ALIRA_REPLAY_SPEED"
+DEFAULT_CASSETTE_PATH = os.path.join("cassettes", "groq.jsonl.gz")
+CASSETTE_MODES = ("record", "replay")
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+# Function to build the lookup key of a request: everything that affects the response
+def request_key(data):
+    return state_backend.hash_key(json.dumps(data, sort_keys=True, ensure_ascii=False))
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+# A recorded response played back with the parts of the requests.Response API the client uses
+class ReplayResponse:
+    def __init__(self, entry, speed):
+        self.status_code = entry["status"]
+        self.text = entry.get("body", "")
+        self.chunks = entry.get("chunks", [])
+        self.speed = speed
+        # Wait for the recorded time to headers (or the whole response when not streamed)
+        self._sleep(entry.get("latency_ms", 0))
+
+    def _sleep(self, ms):
+        if self.speed > 0 and ms > 0:
+            time.sleep(ms / 1000 / self.speed)
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_lines(self, decode_unicode=False):
+        for delay_ms, line in self.chunks:
+            self._sleep(delay_ms)
+            yield line
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Wraps a live streamed response and records its lines with their timing as they are read
+class RecordingResponse:
+    def __init__(self, response, on_complete, latency_ms):
+        self._response = response
+        self._on_complete = on_complete
+        self._latency_ms = latency_ms
+        self._chunks = []
+        self._saved = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def _save(self):
+        if not self._saved:
+            self._saved = True
+            self._on_complete({"status": self._response.status_code, "latency_ms": self._latency_ms, "chunks": self._chunks})
+
+    def iter_lines(self, decode_unicode=False):
+        last = time.perf_counter()
+        for line in self._response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            now = time.perf_counter()
+            self._chunks.append([round((now - last) * 1000, 1), line])
+            last = now
+            # Consumers stop reading at [DONE], so the stream is complete here
+            if line.strip() == "data: [DONE]":
+                self._save()
+            yield line
+        self._save()
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Cassette:
+    def __init__(self, path, mode, speed=1.0):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {CASSETTE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.entries = {}
+        # Recordings of the same request are replayed in order, the last one repeating
+        self._positions = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self.load()
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return self
+        with _open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault(entry["key"], []).append(entry)
+        return self
+
+    def append(self, entry):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # gzip files can be appended to: each write adds a member that is read back transparently
+            with _open(self.path, "a") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.entries.setdefault(entry["key"], []).append(entry)
+
+    # Function to serve a recorded response; raises CassetteMiss when the request was never recorded
+    def replay(self, data, stream=False):
+        key = request_key(data)
+        with self._lock:
+            recordings = self.entries.get(key)
+            if not recordings:
+                raise CassetteMiss(
+                    f"No recorded response for this request in '{self.path}'; "
+                    f"record it with {CASSETTE_MODE_ENV_VAR}=record"
+                )
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            entry = recordings[min(position, len(recordings) - 1)]
+        return ReplayResponse(entry, self.speed)
+
+    # Function to send a live request and record its response
+    def record(self, data, send, stream=False):
+        key = request_key(data)
+        started = time.perf_counter()
+        response = send()
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        def save(entry):
+            self.append({"key": key, "model": data.get("model"), "stream": stream, **entry})
+
+        if stream and response.status_code == 200:
+            return RecordingResponse(response, save, latency_ms)
+        save({"status": response.status_code, "latency_ms": latency_ms, "body": response.text})
+        return response
+
+    def request(self, data, send, stream=False):
+        if self.mode == "replay":
+            return self.replay(data, stream)
+        return self.record(data, send, stream)
+
+
+# Function to get the cassette configured by the environment (None when record/replay is off)
+def get_cassette():
+    global _cassette
+    mode = os.environ.get(CASSETTE_MODE_ENV_VAR, "").strip().lower()
+    if not mode:
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(
+                    os.environ.get(CASSETTE_PATH_ENV_VAR, DEFAULT_CASSETTE_PATH),
+                    mode,
+                    float(os.environ.get(REPLAY_SPEED_ENV_VAR, 1.0)),
+                )
+    return _cassette
+
+
+def is_replaying():
+    active = get_cassette()
+    return active is not None and active.mode == "replay"
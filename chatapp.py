@@ -1,68 +1,150 @@
 import streamlit as st
-import os
-import random
-import requests
-import json
+import threading
 from datetime import datetime
-from PIL import Image
+from functools import partial
+import groq_client
+import image_catalog
+from image_catalog import load_image_derivative
+from warmup import start_warmup, get_warmup_report
+from post_validator import generate_validated_post, is_error_response
+from near_duplicates import NearDuplicateIndex
+from state_backend import ScheduleStore, allow_request
+from budgets import get_budget_tracker, describe_budget
+from posting_times import get_engagement_curves, suggest_slot
+from structured_output import LOCALES, generate_localized_posts
+from carousel import select_carousel, listing_key, MIN_CAROUSEL_SIZE, MAX_CAROUSEL_SIZE
+from overlays import load_overlay_templates, render_overlay, DEFAULT_LOGO_PATH
+from speculative import SpeculativeGenerator, DEFAULT_DEBOUNCE_SECONDS
+from profiling import start_rerun, finish_rerun, profile_section, render_profile
+from compliance import PhraseMatcher, load_compliance_phrases, highlight_violations, missing_disclosures, scan_history
 
 # Groq API Configuration
-GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
-GROQ_API_KEY = st.secrets["groq"]["api_key"]
+try:
+    GROQ_API_KEY = st.secrets["groq"]["api_key"]
+except (FileNotFoundError, KeyError):
+    # No secrets file: use GROQ_API_KEY, or no key at all when replaying a cassette
+    GROQ_API_KEY = groq_client.load_api_key()
 
 # App title and configuration
 st.set_page_config(page_title="Alira - Real Estate Content Generator", layout="wide")
 
-# Function to generate content via the Groq API
-def generate_content_groq(prompt, platform):
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {GROQ_API_KEY}',
-    }
+# Warm caches and the Groq connection in the background (once per server process)
+start_warmup(GROQ_API_KEY)
 
-    # Platform specific prompts
-    platform_prompts = {
-        "Facebook": "Generate a promotional real estate post for Facebook. Include a compelling paragraph (100-150 words) that highlights property features and neighborhood benefits. End with 3-4 relevant hashtags.",
-        "Instagram": "Create an Instagram caption for a real estate property. Keep it under 100 words, engaging and visually descriptive. Include 5-7 trending real estate hashtags at the end.",
-        "LinkedIn": "Craft a professional real estate listing for LinkedIn. Focus on investment potential, property specifications, and market analysis (100-150 words). Include 2-3 professional hashtags."
-    }
+# Function to generate content via the Groq API, counted against the agent's budgets.
+# Every Send asks for a fresh post; the response cache is only used by the warm-up and the API.
+def generate_content_groq(prompt, platform, agent=None):
+    return groq_client.generate_content_groq(prompt, platform, GROQ_API_KEY, use_cache=False, agent=agent)
 
-    # Combine platform-specific prompt with user input
-    full_prompt = f"{platform_prompts[platform]} Based on this additional information: {prompt}"
+# Function to stream content via the Groq API (used for speculative pre-generation)
+def stream_content_groq(prompt, platform, agent=None):
+    return groq_client.stream_content_groq(prompt, platform, GROQ_API_KEY, agent=agent, use_cache=False)
 
-    data = {
-        "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-        "messages": [{"role": "user", "content": full_prompt}]
-    }
+# Function to watch the input while speculative mode is on; reruns only this fragment.
+# st.text_area only sends its value on blur or Ctrl+Enter, so this sees the last committed text.
+@st.fragment(run_every=DEFAULT_DEBOUNCE_SECONDS / 2)
+def watch_input_for_speculation(platform):
+    st.session_state.speculative.observe(st.session_state.get("message_input", ""), platform)
 
-    try:
-        response = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(data))
-        
-        if response.status_code == 200:
-            return response.json().get('choices', [{}])[0].get('message', {}).get('content', 'No content generated')
-        else:
-            return f"Error: {response.status_code} - {response.text}"
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
+# Function to generate every selected language in one structured call; returns (content, issues, other languages)
+def generate_localized_content(prompt, platform, locales, agent=None):
+    posts, errors = generate_localized_posts(prompt, platform, locales, GROQ_API_KEY, agent, use_cache=False)
+    if not posts:
+        # Schema errors like "expected a JSON object" are shown as errors, not as a post
+        message = "; ".join(errors.get("*", ["No content generated"]))
+        return message if is_error_response(message) else f"Error: {message}", [], {}
+
+    primary = next(locale for locale in locales if locale in posts)
+    content, issues = posts[primary]
+    issues = issues + [f"{LOCALES[locale]}: {', '.join(problems)}" for locale, problems in errors.items() if locale in LOCALES]
+    variants = {locale: text for locale, (text, _) in posts.items() if locale != primary}
+    return content, issues, variants
+
+# Function to build the compliance phrase matcher once per server process
+@st.cache_resource
+def get_compliance_matcher():
+    phrases, required = load_compliance_phrases()
+    return PhraseMatcher(phrases), required
+
+# Function to check generated text and return (highlighted html, matches, missing disclosures);
+# the text is only scanned when no matches from an earlier scan are passed in
+def check_compliance(content, matches=None):
+    matcher, required = get_compliance_matcher()
+    if matches is None:
+        with profile_section("compliance_scan"):
+            matches = matcher.scan(content)
+    return highlight_violations(content, matches), matches, missing_disclosures(content, required)
+
+# Function to scan the bot messages added since the last rerun (and their other languages) in one pass
+def scan_chat_history():
+    matcher, _ = get_compliance_matcher()
+    messages = [message for message in st.session_state.chat_history if message["role"] == "assistant"]
+    with profile_section("compliance_scan"):
+        scan_history(matcher, messages)
+        for message in messages:
+            if message.get("variants") and "variant_matches" not in message:
+                message["variant_matches"] = {locale: matcher.scan(text) for locale, text in message["variants"].items()}
+
+# Generations per agent per minute, shared across replicas
+SEND_RATE_LIMIT = 10
+
+# Function to get the near-duplicate index of an agent's schedule. It is built once per server
+# process and shared by all of the agent's sessions, so a new session doesn't MinHash every post again.
+@st.cache_resource
+def get_duplicate_index(owner):
+    return {"index": NearDuplicateIndex(), "indexed": 0, "lock": threading.Lock()}
+
+# Function to add posts scheduled since the last sync (by any session or replica) to the shared index
+def sync_duplicate_index(owner):
+    shared = get_duplicate_index(owner)
+    with shared["lock"]:
+        for post in ScheduleStore().list(owner, start=shared["indexed"]):
+            shared["index"].add(post["id"], post["content"], post["platform"])
+            shared["indexed"] = post["id"] + 1
+    return shared
+
+# Function to find near-duplicates of a post among the agent's scheduled posts: [(post id, similarity)]
+def find_duplicates(content, platform):
+    shared = sync_duplicate_index(st.session_state.user_name)
+    with shared["lock"]:
+        return shared["index"].query(content, platform)
+
+# Function to schedule a post unless it's a near-duplicate of a scheduled one; near-duplicates wait
+# in pending_duplicate until the agent confirms. Returns True if the post was scheduled.
+def request_schedule(content, platform, idx):
+    duplicates = find_duplicates(content, platform)
+    if duplicates:
+        st.session_state.pending_duplicate = {"idx": idx, "content": content, "matches": duplicates}
+        return False
+    schedule_post(content, platform)
+    return True
+
+# Function to pull scheduled posts saved by any replica into this session
+def sync_scheduled_posts():
+    new_posts = ScheduleStore().list(st.session_state.user_name, start=len(st.session_state.scheduled_posts))
+    st.session_state.scheduled_posts.extend(new_posts)
+
+# Function to add a post to the shared schedule, at the best open slot for its platform
+def schedule_post(content, platform):
+    post_title = f"AI Generated Content - {platform}"
+    occupied = [(post["platform"], post["scheduled_for"]) for post in st.session_state.scheduled_posts if post.get("scheduled_for")]
+    slot = suggest_slot(platform, get_engagement_curves().curve(platform), occupied)
+    ScheduleStore().add(st.session_state.user_name, {
+        "title": post_title,
+        "platform": platform,
+        "time": slot.strftime("%a %b %d, %I:%M %p"),
+        "scheduled_for": slot.isoformat(),
+        "content": content
+    })
+    sync_scheduled_posts()
+
+# Platforms that support multi-image carousel posts
+CAROUSEL_PLATFORMS = ["Facebook", "Instagram"]
 
 # Function to get a random image from the folder
 def get_random_image(folder_path):
     try:
-        # List all files in the folder
-        all_files = os.listdir(folder_path)
-        
-        # Filter out non-image files
-        image_files = [f for f in all_files if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
-        
-        if not image_files:
-            return None
-        
-        # Select a random image
-        selected_image = random.choice(image_files)
-        
-        # Return the full path
-        image_path = os.path.join(folder_path, selected_image)
-        return image_path
+        return image_catalog.get_random_image(folder_path)
     except Exception as e:
         st.error(f"Error accessing images: {str(e)}")
         return None
@@ -381,6 +463,15 @@ def load_css():
         font-weight: 400;
     }
     
+    /* Compliance scanner highlights */
+    mark.compliance-flag {
+        background-color: #FDECEA;
+        color: #B71C1C;
+        border-bottom: 2px solid #E53935;
+        padding: 0 2px;
+        border-radius: 3px;
+    }
+    
     /* Image inside chat message */
     .assistant-message img {
         max-width: 100%;
@@ -462,7 +553,8 @@ def load_css():
 
 def main():
     # Load custom CSS
-    load_css()
+    with profile_section("load_css"):
+        load_css()
 
     # App header
     st.markdown('<h1 class="main-header">Alira</h1>', unsafe_allow_html=True)
@@ -479,11 +571,16 @@ def main():
         st.session_state.user_role = "Senior Real Estate Agent"
     if 'scheduled_posts' not in st.session_state:
         st.session_state.scheduled_posts = []
+    if 'pending_duplicate' not in st.session_state:
+        st.session_state.pending_duplicate = None
+    if 'speculative' not in st.session_state:
+        st.session_state.speculative = SpeculativeGenerator(partial(stream_content_groq, agent=st.session_state.user_name))
+    sync_scheduled_posts()
 
     # Create two columns for layout
     left_col, right_col = st.columns([1, 3])
 
-    with left_col:
+    with left_col, profile_section("sidebar"):
         # User avatar and info
         st.markdown('<div class="user-info">', unsafe_allow_html=True)
         st.markdown(f"""
@@ -553,6 +650,49 @@ def main():
             """, unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
+        # Speculative pre-generation while the agent is still typing
+        if st.toggle("⚡ Speculative generation", key="speculative_mode",
+                     help=f"Start generating once the description has been unchanged for {DEFAULT_DEBOUNCE_SECONDS:g}s"):
+            metrics = st.session_state.speculative.metrics
+            st.caption(
+                f"Started {metrics['started']} • served {metrics['served']} • cancelled {metrics['cancelled']} • "
+                f"wasted ~{metrics['wasted_chunks']} tokens • saved {metrics['latency_saved_s']:.1f}s"
+            )
+        else:
+            st.session_state.speculative.cancel()
+        
+        # Carousel size for platforms that support multi-image posts
+        if platform in CAROUSEL_PLATFORMS:
+            st.checkbox("🖼️ Carousel post", key="carousel_mode")
+            if st.session_state.carousel_mode:
+                st.slider("Carousel images", MIN_CAROUSEL_SIZE, MAX_CAROUSEL_SIZE, 5, key="carousel_size")
+        
+        # Branded overlay (badge, price, address, agent and logo) on the post image
+        with st.expander("🏷️ Listing overlay"):
+            st.checkbox("Add overlay to the image", key="overlay_mode")
+            st.selectbox("Template", list(load_overlay_templates()), format_func=lambda name: name.replace("_", " ").title(), key="overlay_template")
+            st.text_input("Price", placeholder="$1,250,000", key="overlay_price")
+            st.text_input("Address", placeholder="42 Ocean Drive, Miami Beach", key="overlay_address")
+        
+        # Languages to generate in a single structured call
+        st.multiselect(
+            "Languages",
+            list(LOCALES),
+            default=["en"],
+            format_func=lambda locale: LOCALES[locale],
+            key="post_locales",
+        )
+        
+        # Groq usage against the agent's budgets (shared by every replica)
+        budget_status = get_budget_tracker().status(st.session_state.user_name)
+        for warning in budget_status.warnings:
+            st.warning(f"Approaching budget: {warning}")
+        with st.expander("📊 Usage"):
+            for budget, (used, limit) in budget_status.usage["agent"].items():
+                st.progress(min(used / limit, 1.0) if limit else 0.0, text=f"{describe_budget(budget).capitalize()}: {used:,} / {limit:,}")
+            if st.checkbox("Show team usage report", key="show_usage_report"):
+                st.dataframe(get_budget_tracker().report(), hide_index=True)
+        
         # Clear chat button
         if st.button("🗑️ Start New Chat", key="clear_chat"):
             st.session_state.chat_history = []
@@ -565,82 +705,134 @@ def main():
         # Chat history container
         st.markdown('<div class="chat-history-container">', unsafe_allow_html=True)
         
-        # Display chat history or empty state
-        if not st.session_state.chat_history:
-            st.markdown("""
-                <div class="empty-chat">
-                    <div class="empty-chat-icon">💬</div>
-                    <h3>Start a conversation with Alira</h3>
-                    <p>Describe your property to generate premium content for your selected platform.</p>
-                </div>
-            """, unsafe_allow_html=True)
-        else:
-            for idx, message in enumerate(st.session_state.chat_history):
-                if message["role"] == "user":
-                    st.markdown(f"""
-                        <div class="chat-message user-message">
-                            <div class="chat-avatar user-chat-avatar">SM</div>
-                            <div class="message-content">
-                                <div class="message-header">
-                                    <span class="message-name">{st.session_state.user_name}</span>
-                                    <span class="message-time">{message["time"]}</span>
+        with profile_section("chat_history"):
+            # Display chat history or empty state
+            if not st.session_state.chat_history:
+                st.markdown("""
+                    <div class="empty-chat">
+                        <div class="empty-chat-icon">💬</div>
+                        <h3>Start a conversation with Alira</h3>
+                        <p>Describe your property to generate premium content for your selected platform.</p>
+                    </div>
+                """, unsafe_allow_html=True)
+            else:
+                scan_chat_history()
+                for idx, message in enumerate(st.session_state.chat_history):
+                    if message["role"] == "user":
+                        st.markdown(f"""
+                            <div class="chat-message user-message">
+                                <div class="chat-avatar user-chat-avatar">SM</div>
+                                <div class="message-content">
+                                    <div class="message-header">
+                                        <span class="message-name">{st.session_state.user_name}</span>
+                                        <span class="message-time">{message["time"]}</span>
+                                    </div>
+                                    <div class="message-text">{message["content"]}</div>
                                 </div>
-                                <div class="message-text">{message["content"]}</div>
                             </div>
-                        </div>
-                    """, unsafe_allow_html=True)
+                        """, unsafe_allow_html=True)
                     
-                    # Use a unique key for each button by including the message index
+                        # Use a unique key for each button by including the message index
                     
                         
                         
-                else:
-                    st.markdown('<div class="chat-message assistant-message">', unsafe_allow_html=True)
-                    st.markdown(f"""
-                        <div class="chat-avatar assistant-chat-avatar">AI</div>
-                        <div class="message-content">
-                            <div class="message-header">
-                                <span class="message-name">Alira Assistant</span>
-                                <span class="message-time">{message["time"]}</span>
-                            </div>
-                    """, unsafe_allow_html=True)
+                    else:
+                        st.markdown('<div class="chat-message assistant-message">', unsafe_allow_html=True)
+                        st.markdown(f"""
+                            <div class="chat-avatar assistant-chat-avatar">AI</div>
+                            <div class="message-content">
+                                <div class="message-header">
+                                    <span class="message-name">Alira Assistant</span>
+                                    <span class="message-time">{message["time"]}</span>
+                                </div>
+                        """, unsafe_allow_html=True)
                     
-                    # Display image if present
-                    if "image_path" in message and message["image_path"]:
-                        try:
-                            image = Image.open(message["image_path"])
-                            st.image(image, use_container_width=True)
+                        # Display carousel images if present
+                        if len(message.get("image_paths") or []) > 1:
+                            try:
+                                with profile_section("image_decode"):
+                                    columns = st.columns(min(len(message["image_paths"]), 5))
+                                    for position, carousel_image in enumerate(message["image_paths"]):
+                                        with columns[position % len(columns)]:
+                                            st.image(load_image_derivative(carousel_image), use_container_width=True)
+                                st.caption(f"Carousel • {len(message['image_paths'])} images")
+                            except Exception as e:
+                                st.error(f"Error displaying image: {str(e)}")
+                        
+                        # Display image if present
+                        elif "image_path" in message and message["image_path"]:
+                            try:
+                                with profile_section("image_decode"):
+                                    image = load_image_derivative(message["image_path"])
+                                    st.image(image, use_container_width=True)
                             
-                            # Image metadata
-                            st.markdown("""
-                                <div style="margin-top: 10px; font-family: 'Poppins', sans-serif; font-size: 13px; color: #666; margin-bottom: 15px;">
-                                    <span style="color: #123C69; font-weight: 500;">Image ID:</span> PRO-23854 | 
-                                    <span style="color: #123C69; font-weight: 500;">Resolution:</span> Premium Quality |
-                                    <span style="color: #123C69; font-weight: 500;">License:</span> Commercial
-                                </div>
-                            """, unsafe_allow_html=True)
-                        except Exception as e:
-                            st.error(f"Error displaying image: {str(e)}")
+                                # Image metadata
+                                st.markdown("""
+                                    <div style="margin-top: 10px; font-family: 'Poppins', sans-serif; font-size: 13px; color: #666; margin-bottom: 15px;">
+                                        <span style="color: #123C69; font-weight: 500;">Image ID:</span> PRO-23854 | 
+                                        <span style="color: #123C69; font-weight: 500;">Resolution:</span> Premium Quality |
+                                        <span style="color: #123C69; font-weight: 500;">License:</span> Commercial
+                                    </div>
+                                """, unsafe_allow_html=True)
+                            except Exception as e:
+                                st.error(f"Error displaying image: {str(e)}")
                             
-                    # Display the content
-                    st.markdown(f"""
-                        <div class="message-text">{message["content"]}</div>
-                    """, unsafe_allow_html=True)
+                        # Display the content with compliance flags highlighted
+                        highlighted, violations, missing = check_compliance(message["content"], message.get("compliance_matches"))
+                        st.markdown(f"""
+                            <div class="message-text">{highlighted}</div>
+                        """, unsafe_allow_html=True)
+                        if violations:
+                            flagged = ", ".join(sorted({f'"{v.phrase}" ({v.category})' for v in violations}))
+                            st.warning(f"Compliance review needed: {flagged}")
+                        if missing:
+                            st.warning(f"Missing required disclosures: {', '.join(missing)}")
+                        if message.get("validation_issues"):
+                            st.info(f"Platform limits not met: {'; '.join(message['validation_issues'])}")
+                        
+                        # Other language versions from the same structured call
+                        variants = message.get("variants") or {}
+                        if variants:
+                            for locale, tab in zip(variants, st.tabs([LOCALES[locale] for locale in variants])):
+                                with tab:
+                                    highlighted_variant, _, _ = check_compliance(variants[locale], message.get("variant_matches", {}).get(locale))
+                                    st.markdown(f'<div class="message-text">{highlighted_variant}</div>', unsafe_allow_html=True)
+                                    if st.button(f"Schedule {LOCALES[locale]}", key=f"schedule_variant_btn_{idx}_{locale}"):
+                                        request_schedule(variants[locale], st.session_state.current_platform, idx)
+                                        st.rerun()
+                    
+                        # Button with unique key for each message (error messages can't be scheduled)
+                        if not is_error_response(message["content"]) and st.button("Schedule", key=f"use_content_btn_{idx}"):
+                            # Check for near-duplicates of posts already scheduled on this platform
+                            if request_schedule(message["content"], st.session_state.current_platform, idx):
+                                st.success(f"Content added to scheduled posts for {st.session_state.current_platform}")
+                            st.rerun()
                     
-                    # Button with unique key for each message
-                    if st.button("Schedule", key=f"use_content_btn_{idx}"):
-                        # Add to scheduled posts
-                        post_title = f"AI Generated Content - {st.session_state.current_platform}"
-                        st.session_state.scheduled_posts.append({
-                            "title": post_title,
-                            "platform": st.session_state.current_platform,
-                            "time": "Just now",
-                            "content": message["content"]
-                        })
-                        st.success(f"Content added to scheduled posts for {st.session_state.current_platform}")
-                        st.rerun()
+                        # Warn about near-duplicates before the post is queued
+                        pending = st.session_state.pending_duplicate
+                        if pending and pending["idx"] == idx:
+                            post_idx, similarity = pending["matches"][0]
+                            if post_idx >= len(st.session_state.scheduled_posts):
+                                # Scheduled by another session after this one last synced
+                                sync_scheduled_posts()
+                            similar_post = st.session_state.scheduled_posts[post_idx]
+                            st.warning(
+                                f"This post is {similarity:.0%} similar to \"{similar_post['title']}\" "
+                                f"({similar_post['platform']} • {similar_post['time']}). "
+                                "Repetitive content may get less reach."
+                            )
+                            confirm_col, cancel_col = st.columns(2)
+                            with confirm_col:
+                                if st.button("Schedule anyway", key=f"confirm_duplicate_btn_{idx}"):
+                                    schedule_post(pending["content"], st.session_state.current_platform)
+                                    st.session_state.pending_duplicate = None
+                                    st.rerun()
+                            with cancel_col:
+                                if st.button("Cancel", key=f"cancel_duplicate_btn_{idx}"):
+                                    st.session_state.pending_duplicate = None
+                                    st.rerun()
                     
-                    st.markdown('</div></div>', unsafe_allow_html=True)
+                        st.markdown('</div></div>', unsafe_allow_html=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -671,13 +863,21 @@ def main():
             """, unsafe_allow_html=True)
             send_button = st.button("Send", key="send_msg_btn", type="primary")
         
+        # The polling fragment only exists while speculative mode is on
+        if st.session_state.speculative_mode:
+            watch_input_for_speculation(platform)
+        
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Close main container
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Handle message sending
-        if send_button and user_input:
+        if send_button and user_input and not allow_request(f"send:{st.session_state.user_name}", SEND_RATE_LIMIT, 60):
+            st.warning(f"You've reached {SEND_RATE_LIMIT} generations per minute. Please wait a moment and try again.")
+        elif send_button and user_input and not budget_status.allowed:
+            st.error(f"Usage budget reached: {'; '.join(budget_status.exceeded)}. Please try again later.")
+        elif send_button and user_input:
             # Add user message to chat history
             current_time = datetime.now().strftime("%I:%M %p")
             st.session_state.chat_history.append({
@@ -688,18 +888,53 @@ def main():
             
             # Generate AI response
             with st.spinner('Alira is thinking...'):
-                # Generate content
-                generated_content = generate_content_groq(user_input, platform)
+                # Generate content, repairing platform limits locally before re-generating
+                with profile_section("generate_content_groq"):
+                    locales = st.session_state.post_locales or ["en"]
+                    variants = {}
+                    if locales != ["en"]:
+                        generated_content, validation_issues, variants = generate_localized_content(user_input, platform, locales, st.session_state.user_name)
+                    else:
+                        generate = partial(generate_content_groq, agent=st.session_state.user_name)
+                        if st.session_state.speculative_mode:
+                            # Serve the speculative result when it was generated for exactly this text
+                            speculative_content = st.session_state.speculative.take(user_input, platform)
+                            if speculative_content is not None:
+                                generate = lambda prompt, platform: speculative_content if prompt == user_input else generate_content_groq(prompt, platform, st.session_state.user_name)
+                        generated_content, validation_issues = generate_validated_post(generate, user_input, platform)
                 
                 # Get random image
-                image_path = get_random_image("images")
+                with profile_section("get_random_image"):
+                    if platform in CAROUSEL_PLATFORMS and st.session_state.get("carousel_mode"):
+                        # Diverse photos, avoiding the ones recently used for this listing
+                        image_paths = select_carousel("images", st.session_state.carousel_size, listing_key(user_input))
+                    else:
+                        image_paths = [get_random_image("images")]
+                    image_path = image_paths[0] if image_paths else None
+                
+                # Render the overlay onto the cover image (reused if already rendered with the same fields)
+                if image_path and st.session_state.overlay_mode:
+                    try:
+                        with profile_section("render_overlay"):
+                            image_path = render_overlay(image_path, platform, st.session_state.overlay_template, {
+                                "price": st.session_state.overlay_price,
+                                "address": st.session_state.overlay_address,
+                                "agent": st.session_state.user_name,
+                                "logo": DEFAULT_LOGO_PATH
+                            })
+                        image_paths = [image_path] + image_paths[1:]
+                    except Exception as e:
+                        st.error(f"Error rendering overlay: {str(e)}")
                 
                 # Add AI response to chat history
                 st.session_state.chat_history.append({
                     "role": "assistant",
                     "content": generated_content,
                     "time": current_time,
-                    "image_path": image_path
+                    "image_path": image_path,
+                    "image_paths": image_paths,
+                    "validation_issues": validation_issues,
+                    "variants": variants
                 })
             
             # Rerun to update the UI
@@ -707,4 +942,9 @@ def main():
 
 # Run the app
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    start_rerun("chatapp")
+    try:
+        main()
+    finally:
+        finish_rerun()
+    render_profile(get_warmup_report())
\ No newline at end of file
@@ -1,68 +1,50 @@
 import streamlit as st
 import os
-import random
-import requests
-import json
 from datetime import datetime
-from PIL import Image
+import groq_client
+import image_catalog
+from image_catalog import load_image_derivative
+from warmup import start_warmup, get_warmup_report
+from post_validator import generate_validated_post
+from profiling import start_rerun, finish_rerun, profile_section, render_profile
+from compliance import PhraseMatcher, load_compliance_phrases, highlight_violations, missing_disclosures, scan_history
 
 # Groq API Configuration
-GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
-GROQ_API_KEY = st.secrets["groq"]["api_key"]
+try:
+    GROQ_API_KEY = st.secrets["groq"]["api_key"]
+except (FileNotFoundError, KeyError):
+    # No secrets file: use GROQ_API_KEY, or no key at all when replaying a cassette
+    GROQ_API_KEY = groq_client.load_api_key()
 
 # App title and configuration
 st.set_page_config(page_title="Real Estate Content Generator", layout="wide")
 
+# Warm caches and the Groq connection in the background (once per server process)
+start_warmup(GROQ_API_KEY)
+
 # Function to generate content via the Groq API
 def generate_content_groq(prompt, platform):
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {GROQ_API_KEY}',
-    }
-    
-    # Platform specific prompts
-    platform_prompts = {
-        "Facebook": "Generate a promotional real estate post for Facebook. Include a compelling paragraph (100-150 words) that highlights property features and neighborhood benefits. End with 3-4 relevant hashtags.",
-        "Instagram": "Create an Instagram caption for a real estate property. Keep it under 100 words, engaging and visually descriptive. Include 5-7 trending real estate hashtags at the end.",
-        "LinkedIn": "Craft a professional real estate listing for LinkedIn. Focus on investment potential, property specifications, and market analysis (100-150 words). Include 2-3 professional hashtags."
-    }
-    
-    # Combine platform-specific prompt with user input
-    full_prompt = f"{platform_prompts[platform]} Based on this additional information: {prompt}"
-    
-    data = {
-        "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-        "messages": [{"role": "user", "content": full_prompt}]
-    }
-    
-    try:
-        response = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(data))
-        
-        if response.status_code == 200:
-            return response.json().get('choices', [{}])[0].get('message', {}).get('content', 'No content generated')
-        else:
-            return f"Error: {response.status_code} - {response.text}"
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
+    return groq_client.generate_content_groq(prompt, platform, GROQ_API_KEY, use_cache=False)
+
+# Function to build the compliance phrase matcher once per server process
+@st.cache_resource
+def get_compliance_matcher():
+    phrases, required = load_compliance_phrases()
+    return PhraseMatcher(phrases), required
+
+# Function to check generated text and return (highlighted html, matches, missing disclosures);
+# the text is only scanned when no matches from an earlier scan are passed in
+def check_compliance(content, matches=None):
+    matcher, required = get_compliance_matcher()
+    if matches is None:
+        with profile_section("compliance_scan"):
+            matches = matcher.scan(content)
+    return highlight_violations(content, matches), matches, missing_disclosures(content, required)
 
 # Function to get a random image from the folder
 def get_random_image(folder_path):
     try:
-        # List all files in the folder
-        all_files = os.listdir(folder_path)
-        
-        # Filter out non-image files
-        image_files = [f for f in all_files if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
-        
-        if not image_files:
-            return None
-        
-        # Select a random image
-        selected_image = random.choice(image_files)
-        
-        # Return the full path
-        image_path = os.path.join(folder_path, selected_image)
-        return image_path
+        return image_catalog.get_random_image(folder_path)
     except Exception as e:
         st.error(f"Error accessing images: {str(e)}")
         return None
@@ -140,6 +122,12 @@ def load_css():
             background-color: #E3F2FD;
             border: 1px solid #BBDEFB;
         }
+        mark.compliance-flag {
+            background-color: #FDECEA;
+            color: #B71C1C;
+            border-bottom: 2px solid #E53935;
+            padding: 0 2px;
+        }
         .timestamp {
             font-size: 10px;
             color: #757575;
@@ -153,6 +141,11 @@ def load_css():
 def display_chat():
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     
+    # Scan only the bot messages added since the last rerun; the matches are kept on each message
+    matcher, _ = get_compliance_matcher()
+    with profile_section("compliance_scan"):
+        scan_history(matcher, [message for message in st.session_state.messages if message['role'] != 'user'])
+    
     for message in st.session_state.messages:
         timestamp = message["timestamp"]
         if message['role'] == 'user':
@@ -166,15 +159,18 @@ def display_chat():
             </div>
             """, unsafe_allow_html=True)
         else:
+            highlighted, _, _ = check_compliance(message['content'], message.get('compliance_matches'))
             st.markdown(f"""
             <div class="bot-message">
                 <div class="bot-avatar">B</div>
                 <div class="message-bubble bot-bubble">
-                    <strong>Bot:</strong> {message['content']}
+                    <strong>Bot:</strong> {highlighted}
                     <div class="timestamp">{timestamp}</div>
                 </div>
             </div>
             """, unsafe_allow_html=True)
+            if message.get('validation_issues'):
+                st.caption(f"Platform limits not met: {'; '.join(message['validation_issues'])}")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -184,13 +180,15 @@ def show_content_and_image(content, platform):
     
     with col1:
         st.subheader("Property Image")
-        image_path = get_random_image("images")
+        with profile_section("get_random_image"):
+            image_path = get_random_image("images")
         
         if image_path:
             try:
                 # Display image directly in Streamlit
-                image = Image.open(image_path)
-                st.image(image, caption=os.path.basename(image_path), use_container_width=True)
+                with profile_section("image_decode"):
+                    image = load_image_derivative(image_path)
+                    st.image(image, caption=os.path.basename(image_path), use_container_width=True)
             except Exception as e:
                 st.error(f"Error displaying image: {str(e)}")
                 st.info("Please make sure your 'images' folder contains valid image files.")
@@ -199,7 +197,15 @@ def show_content_and_image(content, platform):
     
     with col2:
         st.subheader(f"{platform} Content")
-        st.write(content)
+        highlighted, violations, missing = check_compliance(content)
+        st.markdown(highlighted, unsafe_allow_html=True)
+        
+        # Flag Fair Housing / compliance issues before the post is scheduled
+        if violations:
+            flagged = ", ".join(sorted({f'"{v.phrase}" ({v.category})' for v in violations}))
+            st.warning(f"Compliance review needed: {flagged}")
+        if missing:
+            st.warning(f"Missing required disclosures: {', '.join(missing)}")
         
         # Add copy button functionality
         if st.button("Schedule"):
@@ -209,7 +215,8 @@ def show_content_and_image(content, platform):
 # Main app function
 def main():
     # Load custom CSS
-    load_css()
+    with profile_section("load_css"):
+        load_css()
     
     # App header
     st.markdown('<h1 class="main-header">Alira</h1>', unsafe_allow_html=True)
@@ -217,7 +224,7 @@ def main():
     # Create two columns for layout
     left_col, right_col = st.columns([1, 2])
     
-    with left_col:
+    with left_col, profile_section("sidebar"):
         
         st.markdown('<div class="platform-selector">', unsafe_allow_html=True)
         
@@ -254,7 +261,8 @@ def main():
             st.session_state.messages = []
         
         # Display chat history
-        display_chat()
+        with profile_section("chat_history"):
+            display_chat()
         
         # Input area for user prompt
         user_input = st.chat_input(f"Describe the property to create a {platform} post...")
@@ -270,8 +278,8 @@ def main():
             })
             
             # Generate content using Groq API
-            with st.spinner(f'Creating your {platform} post...'):
-                generated_content = generate_content_groq(user_input, platform)
+            with st.spinner(f'Creating your {platform} post...'), profile_section("generate_content_groq"):
+                generated_content, validation_issues = generate_validated_post(generate_content_groq, user_input, platform)
             
             # Handle API errors
             if generated_content.startswith("Error") or generated_content.startswith("An error occurred"):
@@ -282,7 +290,8 @@ def main():
                 st.session_state.messages.append({
                     'role': 'bot', 
                     'content': generated_content, 
-                    'timestamp': bot_timestamp
+                    'timestamp': bot_timestamp,
+                    'validation_issues': validation_issues
                 })
                 
                 # Show content and image preview
@@ -301,4 +310,9 @@ def main():
 
 # Run the app
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    start_rerun("claudeapp")
+    try:
+        main()
+    finally:
+        finish_rerun()
+    render_profile(get_warmup_report())
\ No newline at end of file
@@ -0,0 +1,214 @@
+import os
+import html
+from collections import deque, namedtuple
+
+# Fair Housing / advertising compliance phrases and the reason each one is flagged.
+# Extend or override them with a compliance_phrases.txt file ("phrase | category" per line).
+DEFAULT_COMPLIANCE_PHRASES = {
+    "adults only": "Familial status",
+    "adult community": "Familial status",
+    "no children": "Familial status",
+    "no kids": "Familial status",
+    "perfect for singles": "Familial status",
+    "ideal for couples": "Familial status",
+    "empty nesters only": "Familial status",
+    "bachelor pad": "Familial status / sex",
+    "mature couple": "Familial status / age",
+    "christian home": "Religion",
+    "christian neighborhood": "Religion",
+    "jewish neighborhood": "Religion",
+    "white neighborhood": "Race / color",
+    "ethnic neighborhood": "Race / national origin",
+    "integrated neighborhood": "Race / color",
+    "english speakers only": "National origin",
+    "must speak english": "National origin",
+    "no immigrants": "National origin",
+    "able-bodied": "Disability",
+    "no wheelchairs": "Disability",
+    "not suitable for handicapped": "Disability",
+    "no section 8": "Source of income",
+    "exclusive neighborhood": "Steering",
+    "restricted community": "Steering",
+    "guaranteed appreciation": "Misleading claim",
+    "guaranteed return": "Misleading claim",
+    "risk-free investment": "Misleading claim",
+}
+
+# Disclosures that must appear in every post (empty by default). Lines starting
+# with "!" in compliance_phrases.txt are added here.
+DEFAULT_REQUIRED_DISCLOSURES = []
+
+COMPLIANCE_PHRASES_FILE = "compliance_phrases.txt"
+
+ComplianceMatch = namedtuple("ComplianceMatch", ["start", "end", "phrase", "category"])
+
+
+# Function to load the phrase list, merging the optional config file over the defaults
+def load_compliance_phrases(path=COMPLIANCE_PHRASES_FILE):
+    phrases = dict(DEFAULT_COMPLIANCE_PHRASES)
+    required = list(DEFAULT_REQUIRED_DISCLOSURES)
+
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("!"):
+                    required.append(line[1:].strip())
+                    continue
+                phrase, _, category = line.partition("|")
+                phrase = phrase.strip().lower()
+                if phrase:
+                    phrases[phrase] = category.strip() or "Custom"
+
+    return phrases, required
+
+
+# Precompiled Aho-Corasick automaton over a fixed phrase list
+class PhraseMatcher:
+    def __init__(self, phrases):
+        # Phrases are matched with runs of whitespace collapsed to one space
+        self.phrases = {" ".join(p.lower().split()): c for p, c in phrases.items() if p.strip()}
+        self.max_length = max((len(p) for p in self.phrases), default=0)
+
+        # Goto transitions, failure links and outputs per node (node 0 is the root)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for phrase in self.phrases:
+            node = 0
+            for char in phrase:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = next_node
+            self.output[node].append(phrase)
+
+        # Breadth-first pass to fill in failure links and merge outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    # Advance the automaton by one (lowercased) character
+    def step(self, node, char):
+        while node and char not in self.goto[node]:
+            node = self.fail[node]
+        return self.goto[node].get(char, 0)
+
+    def scanner(self):
+        return ComplianceScanner(self)
+
+    # Scan a complete text in one pass
+    def scan(self, text):
+        scanner = self.scanner()
+        scanner.feed(text)
+        return scanner.finish()
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+# Incremental scanner: feed streamed tokens and collect matches as they arrive
+class ComplianceScanner:
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.node = 0
+        self.text = []
+        # Original text offset of each character fed to the automaton (whitespace runs count once)
+        self._offsets = []
+        self.matches = []
+        # Matches that end on the last character seen so far; their trailing
+        # word boundary is confirmed by the next character (or finish())
+        self._pending = []
+
+    def feed(self, chunk):
+        new_matches = []
+        for char in chunk:
+            position = len(self.text)
+            self.text.append(char)
+
+            if self._pending:
+                if not _is_word_char(char):
+                    new_matches.extend(self._pending)
+                self._pending = []
+
+            if char.isspace():
+                if self._offsets and self.text[self._offsets[-1]].isspace():
+                    continue
+                lowered = " "
+            else:
+                lowered = char.lower()
+            self._offsets.append(position)
+            self.node = self.matcher.step(self.node, lowered)
+            for phrase in self.matcher.output[self.node]:
+                start = self._offsets[len(self._offsets) - len(phrase)]
+                if start > 0 and _is_word_char(self.text[start - 1]):
+                    continue
+                self._pending.append(
+                    ComplianceMatch(start, position + 1, phrase, self.matcher.phrases[phrase])
+                )
+
+        self.matches.extend(new_matches)
+        return new_matches
+
+    # Flush matches that end at the very end of the text
+    def finish(self):
+        self.matches.extend(self._pending)
+        self._pending = []
+        return self.matches
+
+
+# Function to check which required disclosures are missing from a text
+def missing_disclosures(text, required):
+    lowered = text.lower()
+    return [phrase for phrase in required if phrase.lower() not in lowered]
+
+
+# Function to scan a chat history in bulk. Matches are stored on each message under result_key and
+# messages that already have them are skipped, so only new messages are scanned; returns how many were.
+def scan_history(matcher, messages, content_key="content", result_key="compliance_matches"):
+    scanned = 0
+    for message in messages:
+        if result_key in message:
+            continue
+        message[result_key] = matcher.scan(message.get(content_key) or "")
+        scanned += 1
+    return scanned
+
+
+# Function to wrap offending spans in <mark> tags for the rendered message
+def highlight_violations(text, matches):
+    if not matches:
+        return text
+
+    # Keep the leftmost, longest span when matches overlap
+    spans = sorted(matches, key=lambda m: (m.start, -(m.end - m.start)))
+    parts = []
+    cursor = 0
+    for match in spans:
+        if match.start < cursor:
+            continue
+        parts.append(text[cursor:match.start])
+        parts.append(
+            f'<mark class="compliance-flag" title="{html.escape(match.category, quote=True)}">'
+            f'{text[match.start:match.end]}</mark>'
+        )
+        cursor = match.end
+    parts.append(text[cursor:])
+    return "".join(parts)
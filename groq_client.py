@@ -0,0 +1,196 @@
+import os
+import json
+import tomllib
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import budgets
+import cassette
+import state_backend
+
+# Groq API Configuration
+GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
+GROQ_MODELS_URL = 'https://api.groq.com/openai/v1/models'
+GROQ_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+# Platform specific prompts (override them with a prompt_templates.json file)
+PLATFORM_PROMPTS = {
+    "Facebook": "Generate a promotional real estate post for Facebook. Include a compelling paragraph (100-150 words) that highlights property features and neighborhood benefits. End with 3-4 relevant hashtags.",
+    "Instagram": "Create an Instagram caption for a real estate property. Keep it under 100 words, engaging and visually descriptive. Include 5-7 trending real estate hashtags at the end.",
+    "LinkedIn": "Craft a professional real estate listing for LinkedIn. Focus on investment potential, property specifications, and market analysis (100-150 words). Include 2-3 professional hashtags."
+}
+PROMPT_TEMPLATES_FILE = "prompt_templates.json"
+SECRETS_FILE = os.path.join(".streamlit", "secrets.toml")
+
+HTTP_POOL_SIZE = 10
+
+_session = None
+_session_lock = threading.Lock()
+_templates = None
+
+
+# Function to get the shared HTTP session (keeps TLS connections to Groq alive between calls)
+def get_http_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+# Function to read the API key outside Streamlit: GROQ_API_KEY, then .streamlit/secrets.toml
+def load_api_key(secrets_path=SECRETS_FILE):
+    api_key = os.environ.get("GROQ_API_KEY")
+    if api_key:
+        return api_key
+    if os.path.exists(secrets_path):
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f).get("groq", {}).get("api_key")
+    return None
+
+
+# Function to load the platform prompt templates once per process
+def load_prompt_templates(path=PROMPT_TEMPLATES_FILE):
+    global _templates
+    if _templates is None:
+        templates = dict(PLATFORM_PROMPTS)
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                templates.update(json.load(f))
+        _templates = templates
+    return _templates
+
+
+# Function to combine the platform-specific prompt with user input
+def build_prompt(prompt, platform):
+    return f"{load_prompt_templates()[platform]} Based on this additional information: {prompt}"
+
+
+# Function to read a response from the shared cache (see state_backend.py)
+def get_cached_response(prompt, platform):
+    return state_backend.get_cached_response(platform, prompt)
+
+
+def cache_response(prompt, platform, content):
+    state_backend.cache_response(platform, prompt, content)
+
+
+# Function to read the total tokens from a response's usage (streams report it as x_groq.usage)
+def extract_usage(payload):
+    usage = payload.get('usage') or payload.get('x_groq', {}).get('usage') or {}
+    return usage.get('total_tokens', 0)
+
+
+# Function to send a chat completion request over the shared session (or the cassette, see cassette.py).
+# With an agent, the request counts against their budgets (see budgets.py) and raises BudgetExceeded over a hard limit.
+def post_chat_completion(data, api_key, stream=False, agent=None):
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {api_key}',
+    }
+
+    def send():
+        return get_http_session().post(GROQ_API_URL, headers=headers, data=json.dumps(data), stream=stream)
+
+    if agent:
+        budgets.get_budget_tracker().reserve(agent)
+
+    active = cassette.get_cassette()
+    response = active.request(data, send, stream) if active is not None else send()
+    # Streamed usage arrives with the last chunk, see iter_stream_deltas
+    if agent and not stream and response.status_code == 200:
+        budgets.get_budget_tracker().record_tokens(agent, extract_usage(response.json()))
+    return response
+
+
+# Function to yield the text deltas of a streamed (server-sent events) response
+def iter_stream_deltas(response, agent=None):
+    # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        chunk = json.loads(payload)
+        if agent and extract_usage(chunk):
+            budgets.get_budget_tracker().record_tokens(agent, extract_usage(chunk))
+        delta = (chunk.get('choices') or [{}])[0].get('delta', {}).get('content')
+        if delta:
+            yield delta
+
+
+# Function to generate content via the Groq API
+def generate_content_groq(prompt, platform, api_key, use_cache=True, agent=None):
+    if use_cache:
+        cached = get_cached_response(prompt, platform)
+        if cached is not None:
+            return cached
+
+    data = {
+        "model": GROQ_MODEL,
+        "messages": [{"role": "user", "content": build_prompt(prompt, platform)}]
+    }
+
+    try:
+        response = post_chat_completion(data, api_key, agent=agent)
+
+        if response.status_code == 200:
+            content = response.json().get('choices', [{}])[0].get('message', {}).get('content', 'No content generated')
+            if use_cache:
+                cache_response(prompt, platform, content)
+            return content
+        else:
+            return f"Error: {response.status_code} - {response.text}"
+    except Exception as e:
+        return f"An error occurred: {str(e)}"
+
+
+# Function to stream content from the Groq API; yields text chunks as they arrive
+def stream_content_groq(prompt, platform, api_key, agent=None, use_cache=True):
+    if use_cache:
+        cached = get_cached_response(prompt, platform)
+        if cached is not None:
+            yield cached
+            return
+
+    data = {
+        "model": GROQ_MODEL,
+        "messages": [{"role": "user", "content": build_prompt(prompt, platform)}],
+        "stream": True
+    }
+
+    parts = []
+    try:
+        with post_chat_completion(data, api_key, stream=True, agent=agent) as response:
+            if response.status_code != 200:
+                yield f"Error: {response.status_code} - {response.text}"
+                return
+
+            for delta in iter_stream_deltas(response, agent):
+                parts.append(delta)
+                yield delta
+    except Exception as e:
+        yield f"An error occurred: {str(e)}"
+        return
+
+    if parts and use_cache:
+        cache_response(prompt, platform, "".join(parts))
+
+
+# Function to open (and keep) a pooled TLS connection to the Groq API
+def warm_connection(api_key, timeout=10):
+    if cassette.is_replaying():
+        return 200
+    response = get_http_session().get(
+        GROQ_MODELS_URL,
+        headers={'Authorization': f'Bearer {api_key}'},
+        timeout=timeout,
+    )
+    return response.status_code
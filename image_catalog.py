@@ -0,0 +1,52 @@
+import os
+import random
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageOps
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+DISPLAY_SIZE = (1280, 1280)
+# Decoded derivatives kept in memory per process
+DERIVATIVE_CACHE_SIZE = 64
+
+_catalogs = {}
+_catalog_lock = threading.Lock()
+
+
+# Function to list the images in a folder, re-scanning only when the folder changes
+def load_image_catalog(folder_path):
+    mtime = os.stat(folder_path).st_mtime_ns
+    with _catalog_lock:
+        cached = _catalogs.get(folder_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        image_files = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+        catalog = [os.path.join(folder_path, f) for f in image_files]
+        _catalogs[folder_path] = (mtime, catalog)
+        return catalog
+
+
+# Function to get a random image from the catalog
+def get_random_image(folder_path):
+    catalog = load_image_catalog(folder_path)
+    if not catalog:
+        return None
+    return random.choice(catalog)
+
+
+@lru_cache(maxsize=DERIVATIVE_CACHE_SIZE)
+def _load_derivative(image_path, mtime, max_size):
+    image = Image.open(image_path)
+    # Let the JPEG decoder downscale while decoding instead of decoding at full size
+    image.draft("RGB", max_size)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(max_size)
+    image.load()
+    return image
+
+
+# Function to get a decoded, display-sized copy of an image (cached until the file changes)
+def load_image_derivative(image_path, max_size=DISPLAY_SIZE):
+    return _load_derivative(image_path, os.stat(image_path).st_mtime_ns, tuple(max_size))
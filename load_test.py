@@ -0,0 +1,292 @@
+import gc
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import subprocess
+from datetime import datetime
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+import groq_client
+
+# Load test for `streamlit run chatapp.py`: scripted sessions (switch platform, send, schedule)
+# run through AppTest against a stubbed Groq backend while the session count ramps up.
+# AppTest runs one script at a time per process, so sessions are interleaved and the load
+# an agent puts on the server is modelled with a think time between their interactions.
+# Usage: python load_test.py --levels 1,2,4,8,16 --rounds 3 --history 5
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatapp.py")
+RESULTS_DIR = "load_test_results"
+PLATFORMS = ["Facebook", "Instagram", "LinkedIn"]
+# A level is saturated once its p90 rerun latency is this many times the single-session p90,
+# or once its agents (one interaction per think time each) would need more reruns than the process serves
+SATURATION_FACTOR = 2.0
+DEFAULT_THINK_TIME = 5.0
+RERUN_TIMEOUT = 120
+
+STUB_POST = (
+    "Welcome home to this beautifully updated {bedrooms}-bedroom residence in a quiet, tree-lined neighborhood. "
+    "Sunlight pours through oversized windows into an open living area with hardwood floors, a chef's kitchen "
+    "with quartz counters and stainless appliances, and a breakfast nook overlooking the private garden. "
+    "The primary suite offers a walk-in closet and a spa-inspired bath, while the finished basement adds space "
+    "for a home office or media room. Enjoy evenings on the covered patio, weekends at the nearby park, and an "
+    "easy commute to downtown shops, restaurants and top-rated schools. Listing {listing}.\n\n"
+    "#RealEstate #HomeForSale #DreamHome"
+)
+
+
+# Stand-in for the Groq API with a fixed latency; returns well-formed posts with usage counts
+class StubResponse:
+    status_code = 200
+
+    def __init__(self, data, latency):
+        time.sleep(latency)
+        prompt = data["messages"][-1]["content"]
+        self.content = STUB_POST.format(bedrooms=len(prompt) % 5 + 2, listing=abs(hash(prompt)) % 10000)
+        self.text = json.dumps(self.json())
+
+    def json(self):
+        return {
+            "choices": [{"message": {"content": self.content}}],
+            "usage": {"total_tokens": len(self.content.split()) * 2},
+        }
+
+    def iter_lines(self, decode_unicode=False):
+        for word in self.content.split(" "):
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": word + " "}}]})
+        yield "data: [DONE]"
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def install_stub_backend(latency):
+    def post_chat_completion(data, api_key, stream=False, agent=None):
+        return StubResponse(data, latency)
+    groq_client.post_chat_completion = post_chat_completion
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS only (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+# One agent clicking through chatapp.py; every method is one rerun and returns its latency in ms
+class ScriptedSession:
+    def __init__(self, number, rng):
+        self.number = number
+        self.rng = rng
+        self.sent = 0
+        self.app = AppTest.from_file(APP_PATH, default_timeout=RERUN_TIMEOUT)
+        # Separate agents, so per-agent rate limits and budgets don't throttle the test
+        self.app.session_state["user_name"] = f"loadtest-agent-{number}"
+
+    def _timed_run(self, element=None):
+        started = time.perf_counter()
+        (element or self.app).run()
+        elapsed = (time.perf_counter() - started) * 1000
+        if self.app.exception:
+            raise RuntimeError(f"Session {self.number}: {self.app.exception[0].message}")
+        return elapsed
+
+    def open(self):
+        return self._timed_run()
+
+    def switch_platform(self):
+        return self._timed_run(self.app.radio(key="platform_radio").set_value(self.rng.choice(PLATFORMS)))
+
+    def send(self):
+        self.sent += 1
+        # Unique text per send, like agents describing different listings
+        prompt = f"{self.rng.randint(2, 6)} bed, {self.rng.randint(1, 4)} bath home, listing {self.number}-{self.sent}"
+        latencies = [self._timed_run(self.app.text_area(key="message_input").set_value(prompt))]
+        latencies.append(self._timed_run(self.app.button(key="send_msg_btn").click()))
+        return latencies
+
+    def schedule(self):
+        history = self.app.session_state["chat_history"]
+        last = max(idx for idx, message in enumerate(history) if message["role"] == "assistant")
+        latencies = [self._timed_run(self.app.button(key=f"use_content_btn_{last}").click())]
+        # Confirm if the near-duplicate check asked
+        if self.app.session_state["pending_duplicate"]:
+            latencies.append(self._timed_run(self.app.button(key=f"confirm_duplicate_btn_{last}").click()))
+        return latencies
+
+    # Function to run one realistic round: switch platform, send, maybe schedule
+    def round(self):
+        latencies = [self.switch_platform()]
+        latencies += self.send()
+        if self.rng.random() < 0.5:
+            latencies += self.schedule()
+        return latencies
+
+
+# Function to hide the warnings chatapp's label-less widgets and deprecated arguments log on every rerun.
+# AppTest resets Streamlit's log level, so a filter is used instead.
+def quiet_streamlit_warnings():
+    for name, log in logging.root.manager.loggerDict.items():
+        if name.startswith("streamlit") and isinstance(log, logging.Logger):
+            log.addFilter(lambda record: record.levelno >= logging.ERROR)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"p50_ms": round(p50, 1), "p90_ms": round(p90, 1), "p99_ms": round(p99, 1), "max_ms": round(max(values), 1)}
+
+
+# Function to ramp the session count; returns the results document
+def run_load_test(levels, rounds, history, latency, think_time=DEFAULT_THINK_TIME, seed=0):
+    install_stub_backend(latency)
+    rng = random.Random(seed)
+    sessions = []
+    baseline_rss = current_rss_mb()
+    results = []
+    errors = []
+
+    for level in levels:
+        # New sessions open the app and build up a chat history with images
+        while len(sessions) < level:
+            session = ScriptedSession(len(sessions), random.Random(rng.random()))
+            session.open()
+            for _ in range(history):
+                session.send()
+            sessions.append(session)
+
+        latencies = []
+        started = time.perf_counter()
+        # Interleave the sessions round by round, like agents taking turns on the same server process
+        for _ in range(rounds):
+            for session in sessions:
+                try:
+                    latencies += session.round()
+                except Exception as e:
+                    errors.append(f"level {level}: {str(e)}")
+        wall_time = time.perf_counter() - started
+
+        gc.collect()
+        rss = current_rss_mb()
+        previous_level, previous_rss = (results[-1]["sessions"], results[-1]["rss_mb"]) if results else (0, baseline_rss)
+        reruns_per_s = len(latencies) / wall_time if wall_time else 0.0
+        results.append({
+            "sessions": level,
+            "reruns": len(latencies),
+            "reruns_per_s": round(reruns_per_s, 2),
+            **percentiles(latencies),
+            # Share of the process' capacity used if every agent interacts once per think time
+            "utilization": round(level / think_time / reruns_per_s, 2) if reruns_per_s else None,
+            "rss_mb": round(rss, 1),
+            # Memory added per session since the previous level (the first level includes the app's imports)
+            "rss_per_session_mb": round((rss - previous_rss) / max(level - previous_level, 1), 2),
+        })
+        print(json.dumps(results[-1]), flush=True)
+
+    return {
+        "commit": git_commit(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "config": {"levels": levels, "rounds": rounds, "history": history, "stub_latency_s": latency,
+                   "think_time_s": think_time, "seed": seed},
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "levels": results,
+        "saturation_sessions": find_saturation(results),
+        # Agents the process could serve at the last level's rerun rate
+        "estimated_capacity_sessions": int(think_time * results[-1]["reruns_per_s"]) if results else None,
+        "errors": errors,
+    }
+
+
+# Function to find the first saturated session count (see SATURATION_FACTOR)
+def find_saturation(results):
+    if not results:
+        return None
+    # Levels without any completed rerun have no latency percentiles
+    baseline = results[0].get("p90_ms")
+    for level in results:
+        if (baseline and level.get("p90_ms", 0) > baseline * SATURATION_FACTOR) or (level["utilization"] or 0) >= 1:
+            return level["sessions"]
+    return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Function to print per-level differences against an earlier results file
+def compare_results(current, previous):
+    print(f"\n{previous['commit']} -> {current['commit']}")
+    previous_levels = {level["sessions"]: level for level in previous["levels"]}
+    for level in current["levels"]:
+        before = previous_levels.get(level["sessions"])
+        if before is None:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p90_ms", "p99_ms", "utilization", "rss_per_session_mb"):
+            # Metrics can be missing, e.g. utilization when a level ran no reruns
+            if level.get(metric) is None or before.get(metric) is None:
+                continue
+            change = (level[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            changes.append(f"{metric} {before[metric]} -> {level[metric]} ({change:+.0f}%)")
+        print(f"{level['sessions']:>4} sessions: " + ", ".join(changes))
+    print(f"saturation: {previous['saturation_sessions']} -> {current['saturation_sessions']} sessions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp scripted chatapp.py sessions and report rerun latency and memory.")
+    parser.add_argument("--levels", default="1,2,4,8", help="comma separated session counts")
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per session at each level")
+    parser.add_argument("--history", type=int, default=5, help="messages sent by each new session before measuring")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="seconds the stubbed Groq API takes per request")
+    parser.add_argument("--think-time", type=float, default=DEFAULT_THINK_TIME, help="seconds between an agent's interactions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier results file (or commit) to compare with")
+    args = parser.parse_args()
+    quiet_streamlit_warnings()
+
+    previous = None
+    if args.compare:
+        previous_path = args.compare if os.path.exists(args.compare) else os.path.join(args.output_dir, f"{args.compare}.json")
+        with open(previous_path, encoding="utf-8") as f:
+            previous = json.load(f)
+
+    levels = [int(level) for level in args.levels.split(",")]
+    results = run_load_test(levels, args.rounds, args.history, args.stub_latency, args.think_time, args.seed)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"{results['commit']}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saturation at {results['saturation_sessions'] or 'none of the tested'} sessions, "
+          f"estimated capacity {results['estimated_capacity_sessions']} sessions; results written to {output_path}")
+    for error in results["errors"]:
+        print(f"Error: {error}")
+
+    if previous:
+        compare_results(results, previous)
+
+
+if __name__ == "__main__":
+    main()
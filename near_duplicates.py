@@ -0,0 +1,104 @@
+import re
+import hashlib
+import numpy as np
+
+# MinHash / LSH parameters: 128 permutations split into 32 bands of 4 rows.
+# Posts with a Jaccard similarity around 0.5 and above almost always share a band.
+NUM_PERM = 128
+NUM_BANDS = 32
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.6
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed so signatures stay comparable across reruns and processes
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+
+# Function to split a post into word shingles (lowercased, punctuation dropped)
+def shingle(text, size=SHINGLE_SIZE):
+    words = re.findall(r"[#\w']+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+# Function to compute the MinHash signature of a post
+def minhash_signature(text):
+    shingles = shingle(text)
+    if not shingles:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    # Vectorized universal hashing: one row per shingle, one column per permutation
+    with np.errstate(over="ignore"):
+        permuted = ((hashes[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+# Function to estimate the Jaccard similarity of two signatures
+def estimate_similarity(signature_a, signature_b):
+    return float(np.count_nonzero(signature_a == signature_b)) / NUM_PERM
+
+
+# LSH index of scheduled/published posts, bucketed per platform
+class NearDuplicateIndex:
+    def __init__(self):
+        self.signatures = {}
+        self.platforms = {}
+        # (platform, band number) -> {band bytes: [post keys]}
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __contains__(self, key):
+        return key in self.signatures
+
+    def _bands(self, signature):
+        for band in range(NUM_BANDS):
+            yield band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+
+    def add(self, key, text, platform, signature=None):
+        if key in self.signatures:
+            self.remove(key)
+        if signature is None:
+            signature = minhash_signature(text)
+
+        self.signatures[key] = signature
+        self.platforms[key] = platform
+        for band, band_key in self._bands(signature):
+            self.buckets.setdefault((platform, band), {}).setdefault(band_key, []).append(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        platform = self.platforms.pop(key)
+        for band, band_key in self._bands(signature):
+            bucket = self.buckets.get((platform, band), {}).get(band_key)
+            if bucket and key in bucket:
+                bucket.remove(key)
+
+    # Function to find near-duplicates of a post: returns [(key, similarity)], most similar first
+    def query(self, text, platform, threshold=DEFAULT_THRESHOLD, signature=None):
+        if signature is None:
+            signature = minhash_signature(text)
+
+        candidates = set()
+        for band, band_key in self._bands(signature):
+            candidates.update(self.buckets.get((platform, band), {}).get(band_key, ()))
+
+        matches = []
+        for key in candidates:
+            similarity = estimate_similarity(signature, self.signatures[key])
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: -match[1])
@@ -0,0 +1,226 @@
+import os
+import json
+import math
+import threading
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+import state_backend
+from image_catalog import load_image_derivative
+
+# Branded overlays (badge, price, address, agent name and logo) rendered onto listing photos.
+# Rendered files are keyed by (template, image, platform, field values) and never rendered twice.
+OVERLAY_CACHE_DIR = os.path.join(".cache", "overlays")
+OVERLAY_TEMPLATES_FILE = "overlay_templates.json"
+DEFAULT_LOGO_PATH = "logo.png"
+
+# Output size per platform (feed image recommendations)
+PLATFORM_SIZES = {
+    "Facebook": (1200, 630),
+    "Instagram": (1080, 1080),
+    "LinkedIn": (1200, 627),
+}
+
+# Overlay templates (override or add more with an overlay_templates.json file)
+OVERLAY_TEMPLATES = {
+    "just_listed": {"badge": "Just Listed", "badge_color": "#C9A227", "band_color": "#123C69CC", "text_color": "#FFFFFF"},
+    "open_house": {"badge": "Open House", "badge_color": "#2E8B57", "band_color": "#123C69CC", "text_color": "#FFFFFF"},
+    "price_reduced": {"badge": "Price Reduced", "badge_color": "#B23A48", "band_color": "#123C69CC", "text_color": "#FFFFFF"},
+    "sold": {"badge": "Sold", "badge_color": "#B23A48", "band_color": "#000000B3", "text_color": "#FFFFFF"},
+}
+
+# Fonts tried in order; Pillow's bundled font is the last resort
+FONT_FILES = {
+    "regular": ("DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"),
+    "bold": ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "LiberationSans-Bold.ttf"),
+}
+# Share of the image height taken by the bottom band
+BAND_RATIO = 0.24
+JPEG_QUALITY = 88
+# Bulk renders below this size are not worth starting worker processes for
+MIN_PARALLEL_RENDERS = 4
+RENDER_WORKERS = os.cpu_count() or 1
+
+_templates = None
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# Function to load the overlay templates once per process
+def load_overlay_templates(path=OVERLAY_TEMPLATES_FILE):
+    global _templates
+    if _templates is None:
+        templates = {name: dict(template) for name, template in OVERLAY_TEMPLATES.items()}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for name, template in json.load(f).items():
+                    templates[name] = {**templates.get(name, OVERLAY_TEMPLATES["just_listed"]), **template}
+        _templates = templates
+    return _templates
+
+
+# Function to load a font once per process and size
+@lru_cache(maxsize=32)
+def load_font(size, weight="regular"):
+    for font_file in FONT_FILES[weight]:
+        try:
+            return ImageFont.truetype(font_file, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=16)
+def _logo_layer(logo_path, mtime, height):
+    with Image.open(logo_path) as logo:
+        logo = logo.convert("RGBA")
+        logo.thumbnail((height * 4, height))
+        return logo
+
+
+# Function to get a logo scaled to the overlay, rasterized once until the file changes
+def load_logo_layer(logo_path, height):
+    return _logo_layer(logo_path, os.stat(logo_path).st_mtime_ns, height)
+
+
+@lru_cache(maxsize=32)
+def _platform_derivative(image_path, mtime, size):
+    with Image.open(image_path) as image:
+        width, height = image.size
+        # EXIF orientations 5-8 are rotated by 90 degrees
+        if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            width, height = height, width
+    # Decode just big enough to cover the target, then crop to its aspect ratio
+    scale = max(size[0] / width, size[1] / height)
+    cover = (math.ceil(width * scale), math.ceil(height * scale))
+    return ImageOps.fit(load_image_derivative(image_path, cover).convert("RGB"), size, Image.LANCZOS)
+
+
+# Function to get an image cropped and sized for a platform (cached until the file changes)
+def load_platform_derivative(image_path, platform):
+    return _platform_derivative(image_path, os.stat(image_path).st_mtime_ns, PLATFORM_SIZES[platform])
+
+
+def _file_stamp(path):
+    if not path or not os.path.exists(path):
+        return ""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+# Function to get the output path of an overlay; the same inputs always map to the same file
+def overlay_path(image_path, platform, template_name, fields):
+    template = load_overlay_templates()[template_name]
+    key = state_backend.hash_key(
+        template_name,
+        json.dumps(template, sort_keys=True),
+        image_path,
+        _file_stamp(image_path),
+        platform,
+        json.dumps(fields, sort_keys=True),
+        _file_stamp(fields.get("logo")),
+    )
+    return os.path.join(OVERLAY_CACHE_DIR, f"{key}.jpg")
+
+
+def _text_size(draw, text, font):
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    return right - left, bottom - top
+
+
+def _draw_overlay(image, template, fields):
+    width, height = image.size
+    layer = Image.new("RGBA", image.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    margin = int(min(width, height) * 0.04)
+    color = template["text_color"]
+
+    # Badge in the top-left corner
+    if template.get("badge"):
+        font = load_font(int(height * 0.05), "bold")
+        text_width, text_height = _text_size(draw, template["badge"].upper(), font)
+        padding = int(height * 0.02)
+        box = [margin, margin, margin + text_width + 2 * padding, margin + text_height + 2 * padding]
+        draw.rounded_rectangle(box, radius=padding, fill=template["badge_color"])
+        draw.text((margin + padding, margin + padding), template["badge"].upper(), font=font, fill=color, anchor="lt")
+
+    # Bottom band with price, address and agent, and the logo on the right
+    band_top = int(height * (1 - BAND_RATIO))
+    band_height = height - band_top
+    draw.rectangle([0, band_top, width, height], fill=template["band_color"])
+
+    logo_width = 0
+    logo_path = fields.get("logo")
+    if logo_path and os.path.exists(logo_path):
+        logo = load_logo_layer(logo_path, int(band_height * 0.7))
+        logo_width = logo.width + margin
+        layer.alpha_composite(logo, (width - margin - logo.width, band_top + (band_height - logo.height) // 2))
+
+    lines = [
+        (fields.get("price"), load_font(int(band_height * 0.3), "bold")),
+        (fields.get("address"), load_font(int(band_height * 0.16))),
+        (fields.get("agent"), load_font(int(band_height * 0.13))),
+    ]
+    lines = [(text, font) for text, font in lines if text]
+    y = band_top + int(band_height * 0.12)
+    for text, font in lines:
+        # Shorten lines that would run into the logo
+        while len(text) > 4 and _text_size(draw, text, font)[0] > width - 2 * margin - logo_width:
+            text = text[:-4].rstrip() + "…"
+        draw.text((margin, y), text, font=font, fill=color, anchor="lt")
+        y += _text_size(draw, "Ag", font)[1] + int(band_height * 0.07)
+
+    return Image.alpha_composite(image.convert("RGBA"), layer).convert("RGB")
+
+
+# Function to render one overlay; returns the output path (rendered only if it doesn't exist yet)
+def render_overlay(image_path, platform, template_name, fields):
+    output_path = overlay_path(image_path, platform, template_name, fields)
+    if os.path.exists(output_path):
+        return output_path
+
+    template = load_overlay_templates()[template_name]
+    image = _draw_overlay(load_platform_derivative(image_path, platform), template, fields)
+    os.makedirs(OVERLAY_CACHE_DIR, exist_ok=True)
+    # Write to a temporary file first so parallel renders never expose a partial image
+    temporary_path = f"{output_path}.{os.getpid()}.tmp"
+    image.save(temporary_path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    os.replace(temporary_path, output_path)
+    return output_path
+
+
+def _render_job(job):
+    return render_overlay(job["image_path"], job["platform"], job["template"], job["fields"])
+
+
+# Function to get the worker pool for bulk renders, started on first use and kept for the process.
+# Workers are spawned, not forked: the API and Streamlit servers fork from multi-threaded processes.
+def get_render_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+# Function to render many overlays, in worker processes for bulk runs (parallel=False renders in this process).
+# Jobs are dicts with image_path, platform, template and fields; returns the output paths in order.
+def render_batch(jobs, parallel=True):
+    output_paths = [overlay_path(job["image_path"], job["platform"], job["template"], job["fields"]) for job in jobs]
+    pending = {}
+    for job, output_path in zip(jobs, output_paths):
+        if not os.path.exists(output_path):
+            pending.setdefault(output_path, job)
+
+    if len(pending) < MIN_PARALLEL_RENDERS or not parallel:
+        for job in pending.values():
+            _render_job(job)
+    else:
+        executor = get_render_executor()
+        # Each worker keeps its own font, logo and derivative caches across batches
+        list(executor.map(_render_job, pending.values(), chunksize=max(1, len(pending) // (4 * RENDER_WORKERS))))
+    return output_paths
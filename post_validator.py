@@ -0,0 +1,232 @@
+import re
+
+# Hard limits per platform: word range of the post body (hashtags excluded),
+# hashtag range and the platform's character limit
+PLATFORM_LIMITS = {
+    "Facebook": {"min_words": 100, "max_words": 150, "min_hashtags": 3, "max_hashtags": 4, "max_chars": 63206},
+    "Instagram": {"min_words": 20, "max_words": 100, "min_hashtags": 5, "max_hashtags": 7, "max_chars": 2200},
+    "LinkedIn": {"min_words": 100, "max_words": 150, "min_hashtags": 2, "max_hashtags": 3, "max_chars": 3000},
+}
+
+# Hashtags used to top up posts, in order of preference, with the keywords that make them relevant
+PLATFORM_HASHTAGS = {
+    "Facebook": [
+        ("#RealEstate", ()),
+        ("#DreamHome", ("dream", "family", "home")),
+        ("#HomeForSale", ("sale", "sell", "listing", "listed")),
+        ("#JustListed", ("new", "listed", "listing", "market")),
+        ("#OpenHouse", ("open", "tour", "visit", "showing")),
+        ("#LuxuryHomes", ("luxury", "upscale", "villa", "estate", "premium")),
+        ("#BeachLife", ("beach", "ocean", "waterfront", "coastal", "sea")),
+        ("#FirstTimeHomeBuyer", ("starter", "affordable", "first", "condo")),
+    ],
+    "Instagram": [
+        ("#RealEstate", ()),
+        ("#HomeSweetHome", ("home", "cozy", "family")),
+        ("#DreamHome", ("dream", "stunning", "beautiful")),
+        ("#JustListed", ("new", "listed", "listing", "market")),
+        ("#HouseHunting", ("buyer", "search", "hunting", "looking")),
+        ("#InteriorDesign", ("interior", "design", "kitchen", "living", "modern")),
+        ("#LuxuryLiving", ("luxury", "upscale", "villa", "penthouse", "premium")),
+        ("#HomeGoals", ("goals", "perfect", "spacious")),
+        ("#RealEstateAgent", ("agent", "realtor", "contact")),
+        ("#BeachHouse", ("beach", "ocean", "waterfront", "coastal", "sea")),
+        ("#CityLiving", ("downtown", "city", "loft", "urban", "apartment")),
+    ],
+    "LinkedIn": [
+        ("#RealEstate", ()),
+        ("#RealEstateInvesting", ("investment", "investor", "roi", "return", "yield")),
+        ("#CommercialRealEstate", ("commercial", "office", "retail", "warehouse")),
+        ("#PropertyMarket", ("market", "analysis", "trend", "growth", "demand")),
+        ("#Investment", ("investment", "portfolio", "capital")),
+        ("#RealEstateDevelopment", ("development", "developer", "construction", "zoning")),
+    ],
+}
+
+ERROR_PREFIXES = ("Error", "An error occurred")
+
+HASHTAG_PATTERN = re.compile(r"#\w+")
+# Looser pattern for hashtag blocks, so malformed tags like "#Beach-House" are still picked up and normalized
+RAW_HASHTAG_PATTERN = re.compile(r"#[\w'-]+")
+WORD_PATTERN = re.compile(r"\S+")
+SENTENCE_END_PATTERN = re.compile(r"[.!?](?=\s|$)")
+
+
+# Precompute keyword -> hashtag positions per platform so top-ups don't rescan the tag lists
+def _build_hashtag_index():
+    index = {}
+    for platform, tags in PLATFORM_HASHTAGS.items():
+        keyword_index = {}
+        for position, (tag, keywords) in enumerate(tags):
+            for keyword in keywords:
+                keyword_index.setdefault(keyword, []).append(position)
+        index[platform] = keyword_index
+    return index
+
+HASHTAG_INDEX = _build_hashtag_index()
+
+
+# Function to check whether a generation call returned an error message instead of a post
+def is_error_response(text):
+    return not text or text.startswith(ERROR_PREFIXES)
+
+
+# Function to normalize a hashtag: drop punctuation and keep the original capitalization
+def normalize_hashtag(tag):
+    word = re.sub(r"[^\w]", "", tag.lstrip("#"))
+    return f"#{word}" if word else None
+
+
+# Function to split a post into its body and the trailing block of hashtags
+def split_post(text):
+    lines = text.rstrip().split("\n")
+    trailing = []
+    while lines:
+        line = lines[-1].strip()
+        if line and not RAW_HASHTAG_PATTERN.sub("", line).strip(" ,.;|"):
+            trailing = RAW_HASHTAG_PATTERN.findall(line) + trailing
+            lines.pop()
+        elif not line and trailing:
+            lines.pop()
+        else:
+            break
+
+    body = "\n".join(lines).rstrip()
+
+    # Hashtags appended to the last sentence instead of on their own line
+    if not trailing:
+        match = re.search(r"(\s+#[\w'-]+[,.]?)+\s*$", body)
+        if match:
+            trailing = RAW_HASHTAG_PATTERN.findall(match.group(0))
+            body = body[:match.start()].rstrip()
+
+    return body, trailing
+
+
+def count_words(text):
+    return len(WORD_PATTERN.findall(HASHTAG_PATTERN.sub("", text)))
+
+
+# Function to validate a post against the platform's hard limits; returns a list of issues
+def validate_post(text, platform):
+    limits = PLATFORM_LIMITS[platform]
+    body, trailing = split_post(text)
+    hashtags = HASHTAG_PATTERN.findall(body) + trailing
+    words = count_words(body)
+    issues = []
+
+    if words < limits["min_words"]:
+        issues.append(f"Too short: {words} words (minimum {limits['min_words']})")
+    if words > limits["max_words"]:
+        issues.append(f"Too long: {words} words (maximum {limits['max_words']})")
+
+    unique = {tag.lower() for tag in hashtags}
+    if len(unique) != len(hashtags):
+        issues.append("Duplicate hashtags")
+    if len(unique) < limits["min_hashtags"]:
+        issues.append(f"Too few hashtags: {len(unique)} (minimum {limits['min_hashtags']})")
+    if len(unique) > limits["max_hashtags"]:
+        issues.append(f"Too many hashtags: {len(unique)} (maximum {limits['max_hashtags']})")
+
+    if len(text) > limits["max_chars"]:
+        issues.append(f"Over the {platform} character limit ({len(text)}/{limits['max_chars']})")
+
+    return issues
+
+
+# Function to trim a body to a word budget, preferring to cut at the end of a sentence
+def trim_body(body, max_words, min_words=0):
+    # Inline hashtags don't count as words, the same as in count_words
+    words = [m for m in WORD_PATTERN.finditer(body) if HASHTAG_PATTERN.sub("", m.group())]
+    if len(words) <= max_words:
+        return body
+
+    cutoff = words[max_words - 1].end()
+    sentence_ends = [m.end() for m in SENTENCE_END_PATTERN.finditer(body, 0, cutoff)]
+    if sentence_ends and count_words(body[:sentence_ends[-1]]) >= min_words:
+        return body[:sentence_ends[-1]].rstrip()
+
+    return body[:cutoff].rstrip(" ,;:-") + "…"
+
+
+# Function to pick extra hashtags from the platform index, most relevant first
+def suggest_hashtags(platform, context, exclude, count):
+    tags = PLATFORM_HASHTAGS[platform]
+    keyword_index = HASHTAG_INDEX[platform]
+    scores = [0] * len(tags)
+    for word in set(re.findall(r"[a-z]+", context.lower())):
+        for position in keyword_index.get(word, ()):
+            scores[position] += 1
+
+    excluded = {tag.lower() for tag in exclude}
+    ranked = sorted(range(len(tags)), key=lambda position: (-scores[position], position))
+    suggestions = []
+    for position in ranked:
+        tag = tags[position][0]
+        if tag.lower() not in excluded:
+            suggestions.append(tag)
+            if len(suggestions) == count:
+                break
+    return suggestions
+
+
+# Function to repair a post locally; returns (repaired text, issues that could not be fixed).
+# The hashtag index is English, so other languages can turn off the top-up.
+def repair_post(text, platform, context="", top_up_hashtags=True):
+    limits = PLATFORM_LIMITS[platform]
+    body, trailing = split_post(text)
+
+    # Trim the body to the word limit
+    body = trim_body(body, limits["max_words"], limits["min_words"])
+
+    # Normalize and dedupe hashtags; tags already used inline in the body count towards the total
+    seen = {tag.lower() for tag in HASHTAG_PATTERN.findall(body)}
+    hashtags = []
+    for tag in trailing:
+        tag = normalize_hashtag(tag)
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            hashtags.append(tag)
+
+    inline_count = len(seen) - len(hashtags)
+    budget = max(limits["max_hashtags"] - inline_count, 0)
+    hashtags = hashtags[:budget]
+
+    # Top up from the precomputed index
+    missing = limits["min_hashtags"] - inline_count - len(hashtags)
+    if missing > 0 and top_up_hashtags:
+        hashtags += suggest_hashtags(platform, f"{context} {body}", seen, missing)
+
+    tag_line = " ".join(hashtags)
+    repaired = f"{body}\n\n{tag_line}" if tag_line else body
+
+    # Trim further if the character limit is still exceeded
+    if len(repaired) > limits["max_chars"]:
+        room = limits["max_chars"] - len(tag_line) - 3
+        body = body[:max(room, 0)].rstrip() + "…"
+        repaired = f"{body}\n\n{tag_line}" if tag_line else body
+
+    return repaired, validate_post(repaired, platform)
+
+
+# Function to generate a post, repair it locally and only call the API again when repair can't fix it
+def generate_validated_post(generate, prompt, platform, max_regenerations=1):
+    content = generate(prompt, platform)
+    if is_error_response(content):
+        return content, []
+
+    repaired, issues = repair_post(content, platform, prompt)
+    attempts = 0
+    while issues and attempts < max_regenerations:
+        attempts += 1
+        limits = PLATFORM_LIMITS[platform]
+        retry_prompt = (
+            f"{prompt} (The main text must be between {limits['min_words']} and "
+            f"{limits['max_words']} words, not counting hashtags.)"
+        )
+        content = generate(retry_prompt, platform)
+        if is_error_response(content):
+            break
+        repaired, issues = repair_post(content, platform, prompt)
+
+    return repaired, issues
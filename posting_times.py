@@ -0,0 +1,263 @@
+import os
+import json
+import importlib.util
+import threading
+
+import numpy as np
+import pandas as pd
+
+import state_backend
+
+# Best posting times learned from engagement exports (CSV or Parquet) dropped into engagement_exports/.
+# Each export is aggregated into hour-of-week bins once; new or changed files are picked up incrementally.
+ENGAGEMENT_EXPORTS_DIR = "engagement_exports"
+EXPORT_EXTENSIONS = (".csv", ".csv.gz", ".parquet")
+# Exports and suggested slots use this timezone; naive timestamps are assumed to be in it already
+TIMEZONE_ENV_VAR = "ALIRA_TIMEZONE"
+HOURS_PER_WEEK = 7 * 24
+
+PLATFORM_NAMES = {
+    "facebook": "Facebook",
+    "fb": "Facebook",
+    "instagram": "Instagram",
+    "ig": "Instagram",
+    "linkedin": "LinkedIn",
+    "li": "LinkedIn",
+}
+# Accepted column names for each field, first match wins
+COLUMN_ALIASES = {
+    "timestamp": ("timestamp", "posted_at", "created_time", "publish_time", "date"),
+    "platform": ("platform", "network", "channel"),
+    "engagement": ("engagement", "engagements", "total_engagement"),
+    "likes": ("likes", "reactions"),
+    "comments": ("comments",),
+    "shares": ("shares", "reposts", "retweets"),
+}
+# Used when an export has no total engagement column
+ENGAGEMENT_WEIGHTS = {"likes": 1.0, "comments": 2.0, "shares": 3.0}
+
+# Hours with few posts are pulled towards the platform average by this many pseudo-posts
+PRIOR_WEIGHT = 20
+# Minimum hours between two posts on the same platform
+MIN_GAP_HOURS = 3
+# Score kept by an hour that already has a post on another platform
+CROSS_PLATFORM_PENALTY = 0.7
+DEFAULT_HORIZON_HOURS = HOURS_PER_WEEK
+
+_lock = threading.Lock()
+_curves = None
+
+
+def get_timezone():
+    return os.environ.get(TIMEZONE_ENV_VAR, "UTC")
+
+
+def now_local():
+    return pd.Timestamp.now(tz=get_timezone()).tz_localize(None)
+
+
+# Function to turn a datetime (or ISO string) into a naive timestamp in the configured timezone;
+# timestamps with an offset are converted, naive ones are assumed to be local already
+def to_local(value):
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(get_timezone()).tz_localize(None)
+    return timestamp
+
+
+# Function to convert many datetimes (or ISO strings) at once, like to_local
+def to_local_index(values):
+    try:
+        timestamps = pd.DatetimeIndex(pd.to_datetime(list(values), format="ISO8601"))
+    except (ValueError, TypeError):
+        # Mixed UTC offsets, or offsets mixed with naive times
+        return pd.DatetimeIndex([to_local(value) for value in values])
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_convert(get_timezone()).tz_localize(None)
+    return timestamps
+
+
+def normalize_platform(name):
+    return PLATFORM_NAMES.get(str(name).strip().lower().replace(" ", ""))
+
+
+def _find_columns(columns):
+    lowered = {column.strip().lower(): column for column in columns}
+    found = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                found[field] = lowered[alias]
+                break
+    return found
+
+
+# Function to read only the needed columns of an export; returns a frame with canonical column names
+def read_export(path):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        found = _find_columns(pq.read_schema(path).names)
+        frame = pd.read_parquet(path, columns=list(found.values()))
+    else:
+        found = _find_columns(pd.read_csv(path, nrows=0).columns)
+        # pyarrow's multi-threaded CSV reader is several times faster on large exports
+        engine = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+        frame = pd.read_csv(path, usecols=list(found.values()), engine=engine)
+    if "timestamp" not in found:
+        raise ValueError(f"No timestamp column in '{path}' (expected one of {COLUMN_ALIASES['timestamp']})")
+    return frame.rename(columns={column: field for field, column in found.items()})
+
+
+# Function to aggregate engagement rows into {platform: (engagement sums, post counts)} per hour of week
+def aggregate_engagement(frame, platform=None):
+    try:
+        timestamps = pd.to_datetime(frame["timestamp"], errors="coerce")
+    except ValueError:
+        # Mixed UTC offsets
+        timestamps = pd.to_datetime(frame["timestamp"], errors="coerce", utc=True)
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        timestamps = timestamps.dt.tz_convert(get_timezone())
+    hour_of_week = (timestamps.dt.dayofweek * 24 + timestamps.dt.hour).to_numpy(dtype="float64", na_value=np.nan)
+
+    if "engagement" in frame:
+        engagement = pd.to_numeric(frame["engagement"], errors="coerce").fillna(0).to_numpy(dtype="float64")
+    else:
+        engagement = np.zeros(len(frame))
+        for field, weight in ENGAGEMENT_WEIGHTS.items():
+            if field in frame:
+                engagement += weight * pd.to_numeric(frame[field], errors="coerce").fillna(0).to_numpy(dtype="float64")
+
+    if "platform" in frame:
+        platforms = pd.Categorical(frame["platform"].map(normalize_platform))
+    else:
+        platforms = pd.Categorical([platform] * len(frame))
+    codes = platforms.codes
+    valid = ~np.isnan(hour_of_week) & (codes >= 0)
+
+    # One bincount over (platform, hour) pairs instead of a Python-level group-by
+    bins = codes[valid].astype(np.int64) * HOURS_PER_WEEK + hour_of_week[valid].astype(np.int64)
+    size = len(platforms.categories) * HOURS_PER_WEEK
+    sums = np.bincount(bins, weights=engagement[valid], minlength=size).reshape(-1, HOURS_PER_WEEK)
+    counts = np.bincount(bins, minlength=size).reshape(-1, HOURS_PER_WEEK)
+    return {name: (sums[position], counts[position]) for position, name in enumerate(platforms.categories)}
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+# Hour-of-week engagement totals per platform, kept per export file in the shared state backend
+class EngagementCurves:
+    def __init__(self, backend=None):
+        self.backend = backend or state_backend.get_state_backend()
+        self._key = state_backend.make_key("engagement", "curves")
+        self.files = {}
+        self.load()
+
+    def load(self):
+        raw = self.backend.get(self._key)
+        self.files = json.loads(raw) if raw else {}
+        return self
+
+    def save(self):
+        self.backend.set(self._key, json.dumps(self.files))
+
+    # Function to add (or replace) one export's contribution
+    def ingest(self, name, frame, stamp="", platform=None):
+        aggregated = aggregate_engagement(frame, platform)
+        self.files[name] = {
+            "stamp": stamp,
+            "platforms": {platform_name: [sums.tolist(), counts.tolist()] for platform_name, (sums, counts) in aggregated.items()},
+        }
+        return self
+
+    # Function to ingest new or changed exports from a folder; returns the names of the ingested files
+    def refresh(self, folder_path=ENGAGEMENT_EXPORTS_DIR):
+        with _lock:
+            self.load()
+            if not os.path.isdir(folder_path):
+                return []
+            ingested = []
+            for entry in sorted(os.scandir(folder_path), key=lambda entry: entry.name):
+                if not entry.name.lower().endswith(EXPORT_EXTENSIONS):
+                    continue
+                stamp = _file_stamp(entry.path)
+                if self.files.get(entry.name, {}).get("stamp") == stamp:
+                    continue
+                # Exports without a platform column are attributed by file name, e.g. instagram_2024.csv
+                platform = next((name for key, name in PLATFORM_NAMES.items() if len(key) > 2 and key in entry.name.lower()), None)
+                self.ingest(entry.name, read_export(entry.path), stamp, platform)
+                ingested.append(entry.name)
+            if ingested:
+                self.save()
+            return ingested
+
+    def totals(self, platform):
+        sums = np.zeros(HOURS_PER_WEEK)
+        counts = np.zeros(HOURS_PER_WEEK)
+        for record in self.files.values():
+            if platform in record["platforms"]:
+                file_sums, file_counts = record["platforms"][platform]
+                sums += file_sums
+                counts += file_counts
+        return sums, counts
+
+    # Function to get a platform's relative engagement per hour of week (1.0 = average)
+    def curve(self, platform):
+        sums, counts = self.totals(platform)
+        if counts.sum() == 0:
+            return default_curve()
+        average = sums.sum() / counts.sum()
+        # Shrink sparse hours towards the average, then smooth with the neighbouring hours (wrapping the week)
+        mean = (sums + PRIOR_WEIGHT * average) / (counts + PRIOR_WEIGHT)
+        smoothed = 0.25 * np.roll(mean, 1) + 0.5 * mean + 0.25 * np.roll(mean, -1)
+        return smoothed / smoothed.mean() if smoothed.mean() > 0 else default_curve()
+
+
+# Function to get a generic curve (daytime, weekdays) used before any export is imported
+def default_curve():
+    hours = np.arange(HOURS_PER_WEEK)
+    hour_of_day = hours % 24
+    curve = np.where((hour_of_day >= 8) & (hour_of_day <= 20), 1.0, 0.2)
+    curve[(hour_of_day == 9) | (hour_of_day == 12) | (hour_of_day == 18)] = 1.3
+    curve[hours >= 5 * 24] *= 0.8
+    return curve / curve.mean()
+
+
+# Function to pick the best publish slot for a post, keeping clear of already scheduled posts.
+# occupied is a list of (platform, datetime); returns a naive datetime in the configured timezone.
+def suggest_slot(platform, curve, occupied=(), start=None, horizon_hours=DEFAULT_HORIZON_HOURS, min_gap_hours=MIN_GAP_HOURS):
+    start = to_local(start if start is not None else now_local()).ceil("h")
+    slots = start + pd.to_timedelta(np.arange(horizon_hours), unit="h")
+    scores = np.asarray(curve)[slots.dayofweek * 24 + slots.hour].astype("float64")
+
+    occupied = list(occupied)
+    if occupied:
+        platforms = np.array([other_platform for other_platform, _ in occupied])
+        hours = (to_local_index([when for _, when in occupied]) - start) / pd.Timedelta(hours=1)
+        hours = np.asarray(hours, dtype="float64")
+        # Only posts within the gap of the horizon can affect a slot (past posts are the usual bulk)
+        nearby = (hours > -min_gap_hours) & (hours < horizon_hours + min_gap_hours)
+        same = hours[nearby & (platforms == platform)]
+        other = hours[nearby & (platforms != platform)]
+
+        # Distance in hours from every slot to every nearby post
+        offsets = np.arange(horizon_hours)[:, None]
+        scores[(np.abs(offsets - same) < min_gap_hours).any(axis=1)] = 0.0
+        scores *= CROSS_PLATFORM_PENALTY ** (np.abs(offsets - other) < 1).sum(axis=1)
+
+    if not scores.any():
+        # Everything is taken: fall back to the end of the horizon
+        return (start + pd.Timedelta(hours=horizon_hours)).to_pydatetime()
+    return slots[int(np.argmax(scores))].to_pydatetime()
+
+
+# Function to get the engagement curves for this process, picking up new exports
+def get_engagement_curves(folder_path=ENGAGEMENT_EXPORTS_DIR):
+    global _curves
+    if _curves is None:
+        _curves = EngagementCurves()
+    # Also reloads what other replicas have ingested
+    _curves.refresh(folder_path)
+    return _curves
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+# Set ALIRA_PROFILE=1 (or open the app with ?profile=1) to turn on per-rerun profiling.
+# Set ALIRA_PROFILE_LOG to a file path to also append every rerun to a JSON lines log.
+PROFILE_ENV_VAR = "ALIRA_PROFILE"
+PROFILE_LOG_ENV_VAR = "ALIRA_PROFILE_LOG"
+ROLLING_LOG_SIZE = 100
+
+# Rolling log shared by all sessions of this server process
+_rolling_log = deque(maxlen=ROLLING_LOG_SIZE)
+_log_lock = threading.Lock()
+
+# Each Streamlit session runs its script in its own thread
+_current = threading.local()
+
+# tracemalloc is process-wide: it runs only while at least one profiled rerun is active
+_active_reruns = 0
+_tracing_lock = threading.Lock()
+
+
+def _start_tracing():
+    global _active_reruns
+    with _tracing_lock:
+        if _active_reruns == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _active_reruns += 1
+
+
+# Function to stop tracemalloc once the last profiled rerun is done
+def _stop_tracing():
+    global _active_reruns
+    with _tracing_lock:
+        _active_reruns -= 1
+        if _active_reruns == 0:
+            tracemalloc.stop()
+
+
+# Function to check whether profiling is turned on for this rerun
+def profiling_enabled():
+    if os.environ.get(PROFILE_ENV_VAR, "").lower() in ("1", "true", "yes"):
+        return True
+    try:
+        return st.query_params.get("profile") in ("1", "true")
+    except Exception:
+        return False
+
+
+# Timers and allocation counters for the sections of one script rerun
+class RerunProfiler:
+    def __init__(self, app_name):
+        self.app_name = app_name
+        self.sections = {}
+        self.order = []
+        self.depth = 0
+        self.finished = False
+        _start_tracing()
+        self.started = time.perf_counter_ns()
+        self.started_memory = tracemalloc.get_traced_memory()[0]
+
+    @contextmanager
+    def section(self, name):
+        top_level = self.depth == 0
+        # The peak counter is shared by the whole process, so it is only reset (and reported)
+        # while this is the only profiled rerun
+        track_peak = top_level and _active_reruns == 1
+        if track_peak:
+            tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter_ns()
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            elapsed = time.perf_counter_ns() - started
+            memory_after, peak = tracemalloc.get_traced_memory()
+
+            stats = self.sections.get(name)
+            if stats is None:
+                stats = {"section": name, "calls": 0, "ms": 0.0, "alloc_kb": 0.0, "peak_kb": None, "nested": not top_level}
+                self.sections[name] = stats
+                self.order.append(name)
+            stats["calls"] += 1
+            stats["ms"] += elapsed / 1e6
+            stats["alloc_kb"] += (memory_after - memory_before) / 1024
+            # Peaks are only meaningful for top-level sections (nested ones share the counter)
+            if track_peak and _active_reruns == 1:
+                stats["peak_kb"] = max(stats["peak_kb"] or 0.0, (peak - memory_before) / 1024)
+
+    def finish(self):
+        alloc_kb = (tracemalloc.get_traced_memory()[0] - self.started_memory) / 1024
+        if not self.finished:
+            self.finished = True
+            _stop_tracing()
+        record = {
+            "app": self.app_name,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "total_ms": round((time.perf_counter_ns() - self.started) / 1e6, 3),
+            "alloc_kb": round(alloc_kb, 1),
+            "sections": [
+                {key: round(value, 3) if isinstance(value, float) else value for key, value in self.sections[name].items()}
+                for name in self.order
+            ],
+        }
+
+        with _log_lock:
+            _rolling_log.append(record)
+            log_path = os.environ.get(PROFILE_LOG_ENV_VAR)
+            if log_path:
+                with open(log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        return record
+
+
+# Function to start profiling a rerun; returns None when profiling is off
+def start_rerun(app_name):
+    _current.profiler = RerunProfiler(app_name) if profiling_enabled() else None
+    return _current.profiler
+
+
+# Function to time a section of the current rerun (a no-op when profiling is off)
+@contextmanager
+def profile_section(name):
+    profiler = getattr(_current, "profiler", None)
+    if profiler is None:
+        yield
+        return
+    with profiler.section(name):
+        yield
+
+
+# Function to finish the current rerun and record it in the rolling log
+def finish_rerun():
+    profiler = getattr(_current, "profiler", None)
+    _current.profiler = None
+    if profiler is None:
+        return None
+    record = profiler.finish()
+    st.session_state.last_profile = record
+    return record
+
+
+# Function to summarize the rolling log: mean and p95 per section
+def summarize_log(records):
+    timings = {}
+    for record in records:
+        for section in record["sections"]:
+            timings.setdefault(section["section"], []).append(section["ms"])
+
+    summary = []
+    for name, values in timings.items():
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+        summary.append({
+            "section": name,
+            "reruns": len(values),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "p95_ms": round(p95, 3),
+        })
+    return sorted(summary, key=lambda row: -row["mean_ms"])
+
+
+# Function to render the collapsible profiling overlay
+def render_profile(warmup_report=None):
+    if not profiling_enabled():
+        return
+
+    # The overlay shows the last completed rerun; the one rendering it is still running
+    record = st.session_state.get("last_profile")
+    with st.expander("⏱️ Rerun profile", expanded=False):
+        if record is None:
+            st.caption("No completed rerun yet.")
+            return
+
+        st.caption(f"{record['app']} • {record['time']} • total {record['total_ms']:.1f} ms • "
+                   f"{record['alloc_kb']:.1f} KB allocated (nested sections are included in their parent)")
+        st.dataframe(record["sections"], use_container_width=True, hide_index=True)
+
+        with _log_lock:
+            records = [r for r in _rolling_log if r["app"] == record["app"]]
+        st.caption(f"Last {len(records)} reruns")
+        st.dataframe(summarize_log(records), use_container_width=True, hide_index=True)
+
+        if warmup_report:
+            st.caption("Server warm-up")
+            st.dataframe(
+                [{"step": step, **timing} for step, timing in warmup_report.items()],
+                use_container_width=True,
+                hide_index=True,
+            )
@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+
+from post_validator import is_error_response
+
+# Seconds the input has to stay unchanged before a speculative generation starts
+DEFAULT_DEBOUNCE_SECONDS = float(os.environ.get("ALIRA_SPECULATIVE_DEBOUNCE", 1.5))
+
+
+# One background generation that can be cancelled between streamed chunks
+class SpeculativeJob:
+    def __init__(self, stream, text, platform):
+        self.key = (text.strip(), platform)
+        self.chunks = []
+        self.result = None
+        self.started = time.perf_counter()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(stream, text, platform), daemon=True)
+        self._thread.start()
+
+    def _run(self, stream, text, platform):
+        generator = stream(text, platform)
+        try:
+            for chunk in generator:
+                if self._cancel.is_set():
+                    break
+                self.chunks.append(chunk)
+            else:
+                self.result = "".join(self.chunks)
+        finally:
+            # Closing the generator drops the streamed HTTP response early
+            generator.close()
+            self.finished = time.perf_counter()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return self.result
+
+
+# Per-session speculative pre-generation: debounce the input, generate in the background and
+# serve the result if Send arrives with the same text
+class SpeculativeGenerator:
+    def __init__(self, stream, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS):
+        self.stream = stream
+        self.debounce_seconds = debounce_seconds
+        self.job = None
+        self._pending_key = None
+        self._stable_since = None
+        # Text that was just sent; the input still holds it, so don't speculate on it again
+        self._sent_key = None
+        self.metrics = {
+            "started": 0,
+            "served": 0,
+            "cancelled": 0,
+            "wasted_chunks": 0,
+            "served_chunks": 0,
+            "latency_saved_s": 0.0,
+        }
+
+    def _discard_job(self):
+        if self.job is None:
+            return
+        if not self.job.done:
+            self.job.cancel()
+            self.metrics["cancelled"] += 1
+        # Streamed chunks are roughly one token each
+        self.metrics["wasted_chunks"] += len(self.job.chunks)
+        self.job = None
+
+    # Function to record the current input; starts a generation once it has been stable long enough
+    def observe(self, text, platform, now=None):
+        now = time.monotonic() if now is None else now
+        key = (text.strip(), platform)
+
+        if not key[0] or key == self._sent_key:
+            self._pending_key = None
+            self._discard_job()
+            return None
+
+        if key != self._pending_key:
+            # The text changed: cancel and restart the debounce timer
+            self._pending_key = key
+            self._stable_since = now
+            if self.job is not None and self.job.key != key:
+                self._discard_job()
+            return None
+
+        if self.job is None and now - self._stable_since >= self.debounce_seconds:
+            self.job = SpeculativeJob(self.stream, text, platform)
+            self.metrics["started"] += 1
+        return self.job
+
+    # Function to take the speculative result for Send; returns None when the text doesn't match
+    def take(self, text, platform, timeout=None):
+        key = (text.strip(), platform)
+        sent_at = time.perf_counter()
+        self._sent_key = key
+        job = self.job
+        if job is None or job.key != key:
+            self._discard_job()
+            return None
+
+        result = job.wait(timeout)
+        self.job = None
+        self._pending_key = None
+        if result is None or is_error_response(result):
+            if not job.done:
+                job.cancel()
+                self.metrics["cancelled"] += 1
+            self.metrics["wasted_chunks"] += len(job.chunks)
+            return None
+
+        self.metrics["served"] += 1
+        self.metrics["served_chunks"] += len(job.chunks)
+        # Time the generation had already been running before Send was pressed
+        self.metrics["latency_saved_s"] += max(0.0, min(sent_at, job.finished) - job.started)
+        return result
+
+    def cancel(self):
+        self._pending_key = None
+        self._discard_job()
@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# Shared state for running several app / API replicas side by side.
+# ALIRA_REDIS_URL=redis://host:6379/0 uses Redis (or anything speaking its protocol),
+# ALIRA_REDIS_URL=fakeredis:// uses fakeredis, and no URL keeps state in this process.
+REDIS_URL_ENV_VAR = "ALIRA_REDIS_URL"
+KEY_PREFIX = "alira"
+
+RESPONSE_CACHE_TTL = 24 * 60 * 60
+JOB_RESULT_TTL = 60 * 60
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+# In-process stand-in implementing the subset of the redis-py API used here
+class InMemoryBackend:
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.RLock()
+
+    def _alive(self, key):
+        expires = self._expiry.get(key)
+        if expires is not None and expires <= time.time():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._data[key] if self._alive(key) else None for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = str(value)
+            self._expiry.pop(key, None)
+            if ex:
+                self._expiry[key] = time.time() + ex
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+            return removed
+
+    def incrby(self, key, amount=1):
+        with self._lock:
+            value = int(self._data[key]) + amount if self._alive(key) else amount
+            self._data[key] = str(value)
+            return value
+
+    def incr(self, key, amount=1):
+        return self.incrby(key, amount)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expiry[key] = time.time() + seconds
+            return True
+
+    def rpush(self, key, *values):
+        with self._lock:
+            items = self._data[key] if self._alive(key) else []
+            items.extend(str(value) for value in values)
+            self._data[key] = items
+            return len(items)
+
+    def lpop(self, key):
+        with self._lock:
+            if not self._alive(key) or not self._data[key]:
+                return None
+            return self._data[key].pop(0)
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            if not self._alive(key):
+                return []
+            items = self._data[key]
+            end = len(items) if end == -1 else end + 1
+            return list(items[start:end])
+
+    def llen(self, key):
+        with self._lock:
+            return len(self._data[key]) if self._alive(key) else 0
+
+    def sadd(self, key, *values):
+        with self._lock:
+            members = self._data[key] if self._alive(key) else set()
+            added = len({str(value) for value in values} - members)
+            members.update(str(value) for value in values)
+            self._data[key] = members
+            return added
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._data[key]) if self._alive(key) else set()
+
+    def ping(self):
+        return True
+
+
+# Function to get the shared state backend for this process
+def get_state_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_state_backend(os.environ.get(REDIS_URL_ENV_VAR))
+    return _backend
+
+
+# Function to create a backend from a URL (None -> in-process)
+def create_state_backend(url=None):
+    if not url:
+        return InMemoryBackend()
+    if url.startswith("fakeredis://"):
+        import fakeredis
+        return fakeredis.FakeRedis(decode_responses=True)
+
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def make_key(*parts):
+    return ":".join((KEY_PREFIX,) + tuple(str(part) for part in parts))
+
+
+def hash_key(*parts):
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# Function to read a shared generation response
+def get_cached_response(platform, prompt, backend=None):
+    backend = backend or get_state_backend()
+    return backend.get(make_key("response", hash_key(platform, prompt.strip())))
+
+
+# Function to store a generation response for every replica
+def cache_response(platform, prompt, content, ttl=RESPONSE_CACHE_TTL, backend=None):
+    backend = backend or get_state_backend()
+    backend.set(make_key("response", hash_key(platform, prompt.strip())), content, ex=ttl)
+
+
+# Scheduled posts per owner (an agent name, or "api" for the HTTP service)
+class ScheduleStore:
+    def __init__(self, backend=None):
+        self.backend = backend or get_state_backend()
+
+    def _key(self, owner):
+        return make_key("schedule", owner)
+
+    def add(self, owner, post):
+        post = dict(post)
+        post["id"] = self.backend.rpush(self._key(owner), json.dumps(post)) - 1
+        return post
+
+    def list(self, owner, start=0, platform=None):
+        posts = []
+        for post_id, raw in enumerate(self.backend.lrange(self._key(owner), start, -1), start):
+            post = json.loads(raw)
+            post["id"] = post_id
+            if platform is None or post["platform"] == platform:
+                posts.append(post)
+        return posts
+
+    def count(self, owner):
+        return self.backend.llen(self._key(owner))
+
+
+# FIFO job queue shared by all replicas; results are kept for JOB_RESULT_TTL seconds
+class JobQueue:
+    def __init__(self, name, backend=None):
+        self.name = name
+        self.backend = backend or get_state_backend()
+
+    def enqueue(self, payload):
+        job_id = uuid.uuid4().hex
+        self.backend.set(make_key("job", job_id), json.dumps({"status": "queued"}), ex=JOB_RESULT_TTL)
+        self.backend.rpush(make_key("queue", self.name), json.dumps({"id": job_id, "payload": payload}))
+        return job_id
+
+    def dequeue(self):
+        raw = self.backend.lpop(make_key("queue", self.name))
+        if raw is None:
+            return None
+        job = json.loads(raw)
+        self.set_status(job["id"], "running")
+        return job
+
+    def set_status(self, job_id, status, result=None):
+        record = {"status": status}
+        if result is not None:
+            record["result"] = result
+        self.backend.set(make_key("job", job_id), json.dumps(record), ex=JOB_RESULT_TTL)
+
+    def get_status(self, job_id):
+        raw = self.backend.get(make_key("job", job_id))
+        return json.loads(raw) if raw else None
+
+    def __len__(self):
+        return self.backend.llen(make_key("queue", self.name))
+
+
+# Function to apply a fixed-window rate limit shared by all replicas; returns True if allowed
+def allow_request(bucket, limit, window_seconds, backend=None):
+    backend = backend or get_state_backend()
+    window = int(time.time() // window_seconds)
+    key = make_key("rate", bucket, window)
+    count = backend.incr(key)
+    if count == 1:
+        backend.expire(key, window_seconds * 2)
+    return count <= limit
+
+
+# Function to hold a lock shared by all replicas (SET NX with an expiry, so a crashed holder
+# only blocks the others for ttl seconds); raises TimeoutError after waiting timeout seconds
+@contextmanager
+def shared_lock(name, ttl=10, timeout=10, backend=None):
+    backend = backend or get_state_backend()
+    key = make_key("lock", name)
+    token = uuid.uuid4().hex
+    deadline = time.time() + timeout
+    while not backend.set(key, token, ex=ttl, nx=True):
+        if time.time() > deadline:
+            raise TimeoutError(f"Timed out waiting for the '{name}' lock")
+        time.sleep(0.05)
+    try:
+        yield
+    finally:
+        # Only release the lock if it hasn't expired and been taken by someone else
+        if backend.get(key) == token:
+            backend.delete(key)
@@ -0,0 +1,218 @@
+import re
+import json
+
+import groq_client
+import state_backend
+from post_validator import repair_post
+
+# Locales offered for multi-language posts
+LOCALES = {
+    "en": "English",
+    "es": "Spanish",
+    "fr": "French",
+}
+
+# Schema of one locale's post: field -> expected type
+LOCALE_FIELDS = {
+    "headline": str,
+    "body": str,
+    "hashtags": list,
+}
+
+
+# Function to build a single prompt asking for every requested locale as one JSON object
+def build_structured_prompt(prompt, platform, locales):
+    example = {locale: {"headline": "...", "body": "...", "hashtags": ["#..."]} for locale in locales}
+    languages = ", ".join(f"{LOCALES[locale]} ({locale})" for locale in locales)
+    return (
+        f"{groq_client.build_prompt(prompt, platform)}\n\n"
+        f"Write the post in each of these languages: {languages}. Each language version must follow the "
+        "platform instructions above; put the hashtags only in the hashtags list. Respond with a single JSON "
+        f"object and nothing else, shaped exactly like this: {json.dumps(example)}"
+    )
+
+
+# Function to parse JSON that may be cut off mid-stream or wrapped in a ``` fence.
+# Returns the most complete object that can be recovered, or None.
+def parse_partial_json(text):
+    text = re.sub(r"^\s*```(?:json)?", "", text.strip())
+    start = text.find("{")
+    if start == -1:
+        return None
+    text = text[start:]
+
+    while text:
+        stack = []
+        in_string = False
+        escaped = False
+        # Positions where the document can be cut without leaving a dangling key or comma
+        cut_points = []
+        for position, char in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                continue
+            if char == '"':
+                in_string = True
+            elif char in "{[":
+                stack.append("}" if char == "{" else "]")
+                cut_points.append(position + 1)
+            elif char in "}]":
+                if stack:
+                    stack.pop()
+                if not stack:
+                    text = text[:position + 1]
+                    break
+            elif char == ",":
+                cut_points.append(position)
+
+        candidate = text
+        if in_string:
+            # Close the open string, dropping a dangling escape character
+            candidate = (candidate[:-1] if escaped else candidate) + '"'
+        candidate = re.sub(r"[\s,:]+$", "", candidate)
+        try:
+            return json.loads(candidate + "".join(reversed(stack)))
+        except json.JSONDecodeError:
+            pass
+
+        # Drop the trailing incomplete member and try again
+        cut_points = [point for point in cut_points if point < len(text)]
+        if not cut_points:
+            return None
+        text = text[:cut_points[-1]]
+    return None
+
+
+# Function to validate one locale's fields; returns (clean fields, errors)
+def validate_locale(value, partial=False):
+    if not isinstance(value, dict):
+        return {}, ["expected an object"]
+
+    clean = {}
+    errors = []
+    for field, expected in LOCALE_FIELDS.items():
+        if field not in value:
+            if not partial:
+                errors.append(f"missing '{field}'")
+            continue
+        field_value = value[field]
+        # Models sometimes return the hashtags as a single string
+        if field == "hashtags" and isinstance(field_value, str):
+            field_value = re.findall(r"#?[\w-]+", field_value)
+        if not isinstance(field_value, expected):
+            errors.append(f"'{field}' should be a {expected.__name__}")
+            continue
+        if field == "hashtags":
+            field_value = [tag if tag.startswith("#") else f"#{tag}" for tag in field_value if isinstance(tag, str) and tag]
+        clean[field] = field_value
+    return clean, errors
+
+
+# Function to validate the whole response against the requested locales
+def validate_localized_posts(data, locales, partial=False):
+    if not isinstance(data, dict):
+        return {}, {"*": ["expected a JSON object"]}
+
+    posts = {}
+    errors = {}
+    for locale in locales:
+        if locale not in data:
+            if not partial:
+                errors[locale] = ["missing locale"]
+            continue
+        clean, locale_errors = validate_locale(data[locale], partial)
+        posts[locale] = clean
+        if locale_errors:
+            errors[locale] = locale_errors
+    return posts, errors
+
+
+# Function to turn one locale's fields into post text, repaired to the platform limits
+def compose_post(fields, platform, context="", locale="en"):
+    parts = [fields.get("headline", "").strip(), fields.get("body", "").strip(), " ".join(fields.get("hashtags", []))]
+    text = "\n\n".join(part for part in parts if part)
+    # Suggested hashtags come from an English index; don't mix them into other languages
+    return repair_post(text, platform, context, top_up_hashtags=locale == "en")
+
+
+def _locale_cache_key(prompt, platform, locale):
+    return state_backend.make_key("localized", state_backend.hash_key(platform, prompt.strip(), locale))
+
+
+# Function to read cached locale fields, so already generated languages are reused
+def get_cached_locales(prompt, platform, locales, backend=None):
+    backend = backend or state_backend.get_state_backend()
+    keys = [_locale_cache_key(prompt, platform, locale) for locale in locales]
+    return {locale: json.loads(raw) for locale, raw in zip(locales, backend.mget(keys)) if raw}
+
+
+def cache_locales(prompt, platform, posts, backend=None):
+    backend = backend or state_backend.get_state_backend()
+    for locale, fields in posts.items():
+        backend.set(_locale_cache_key(prompt, platform, locale), json.dumps(fields), ex=state_backend.RESPONSE_CACHE_TTL)
+
+
+def _structured_request(prompt, platform, locales, stream=False):
+    data = {
+        "model": groq_client.GROQ_MODEL,
+        "messages": [{"role": "user", "content": build_structured_prompt(prompt, platform, locales)}],
+        "response_format": {"type": "json_object"},
+    }
+    if stream:
+        data["stream"] = True
+    return data
+
+
+# Function to stream a localized generation; yields (validated partial posts, schema errors, done) snapshots.
+# Schema errors are only known once the response is complete, so partial snapshots have none.
+def stream_localized_posts(prompt, platform, locales, api_key, agent=None):
+    cached = get_cached_locales(prompt, platform, locales)
+    missing = [locale for locale in locales if locale not in cached]
+    if not missing:
+        yield cached, {}, True
+        return
+
+    text = ""
+    posts = {}
+    with groq_client.post_chat_completion(_structured_request(prompt, platform, missing, stream=True), api_key, stream=True, agent=agent) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Error: {response.status_code} - {response.text}")
+        for delta in groq_client.iter_stream_deltas(response, agent):
+            text += delta
+            parsed = parse_partial_json(text)
+            if parsed is not None:
+                posts, _ = validate_localized_posts(parsed, missing, partial=True)
+                yield {**cached, **posts}, {}, False
+
+    posts, errors = validate_localized_posts(parse_partial_json(text), missing)
+    cache_locales(prompt, platform, {locale: fields for locale, fields in posts.items() if locale not in errors})
+    yield {**cached, **posts}, errors, True
+
+
+# Function to generate every requested locale in a single API call.
+# Returns ({locale: (post text, validation issues)}, schema errors)
+def generate_localized_posts(prompt, platform, locales, api_key, agent=None, use_cache=True):
+    cached = get_cached_locales(prompt, platform, locales) if use_cache else {}
+    missing = [locale for locale in locales if locale not in cached]
+    posts = dict(cached)
+    errors = {}
+
+    if missing:
+        try:
+            response = groq_client.post_chat_completion(_structured_request(prompt, platform, missing), api_key, agent=agent)
+            if response.status_code != 200:
+                return {}, {"*": [f"Error: {response.status_code} - {response.text}"]}
+            content = response.json().get('choices', [{}])[0].get('message', {}).get('content', '')
+        except Exception as e:
+            return {}, {"*": [f"An error occurred: {str(e)}"]}
+        generated, errors = validate_localized_posts(parse_partial_json(content), missing)
+        if use_cache:
+            cache_locales(prompt, platform, {locale: fields for locale, fields in generated.items() if locale not in errors})
+        posts.update(generated)
+
+    return {locale: compose_post(fields, platform, prompt, locale) for locale, fields in posts.items()}, errors
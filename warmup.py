@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import logging
+import threading
+
+import groq_client
+from image_catalog import load_image_catalog, load_image_derivative, DERIVATIVE_CACHE_SIZE
+from carousel import get_hash_index
+from posting_times import get_engagement_curves
+
+logger = logging.getLogger(__name__)
+
+# Optional JSON lines file of {"platform", "prompt", "content"} records used to prime the response cache
+WARMUP_HISTORY_ENV_VAR = "ALIRA_WARMUP_HISTORY"
+IMAGES_FOLDER = "images"
+
+_started = False
+_start_lock = threading.Lock()
+_done = threading.Event()
+_report = {}
+
+
+def _timed(name, step):
+    started = time.perf_counter()
+    try:
+        result = step()
+        _report[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "result": result}
+    except Exception as e:
+        _report[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "error": str(e)}
+
+
+# Function to list the catalog and decode as many images as the derivative cache can hold
+def _warm_images(folder_path):
+    catalog = load_image_catalog(folder_path)
+    warmed = catalog[:DERIVATIVE_CACHE_SIZE]
+    for image_path in warmed:
+        load_image_derivative(image_path)
+    return f"{len(warmed)} of {len(catalog)} images"
+
+
+def _prime_response_cache(history_path):
+    if not history_path or not os.path.exists(history_path):
+        return "skipped"
+    primed = 0
+    with open(history_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            groq_client.cache_response(record["prompt"], record["platform"], record["content"])
+            primed += 1
+    return f"{primed} responses"
+
+
+# Function to run every warm-up step; returns the timing report
+def run_warmup(api_key, images_folder=IMAGES_FOLDER, history_path=None):
+    started = time.perf_counter()
+    _timed("prompt_templates", lambda: f"{len(groq_client.load_prompt_templates())} templates")
+    _timed("image_catalog", lambda: _warm_images(images_folder))
+    _timed("image_hashes", lambda: f"{len(get_hash_index(images_folder).paths)} hashes")
+    _timed("engagement_curves", lambda: f"{len(get_engagement_curves().files)} exports")
+    if api_key:
+        _timed("http_pool", lambda: f"HTTP {groq_client.warm_connection(api_key)}")
+    _timed("response_cache", lambda: _prime_response_cache(history_path or os.environ.get(WARMUP_HISTORY_ENV_VAR)))
+    _report["total"] = {"ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    logger.info("Warm-up finished: %s", _report)
+    _done.set()
+    return _report
+
+
+# Function to start the warm-up in a background thread, once per server process
+def start_warmup(api_key, images_folder=IMAGES_FOLDER, history_path=None):
+    global _started
+    with _start_lock:
+        if _started:
+            return False
+        _started = True
+
+    thread = threading.Thread(
+        target=run_warmup,
+        args=(api_key, images_folder, history_path),
+        name="alira-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return True
+
+
+# Function to get the warm-up timing report (empty until it has finished)
+def get_warmup_report(wait=None):
+    if wait is not None:
+        _done.wait(wait)
+    return dict(_report) if _done.is_set() else {}